@@ -27,26 +27,254 @@ __maintainer__ = "RueiKe"
 __status__ = "Stable Release"
 
 import re
+import json
+import errno
 import subprocess
 import shlex
-import socket
 import os
 import platform
+import signal
 import sys
 import time
 from datetime import datetime
-from pathlib import Path
 from uuid import uuid4
 import glob 
 import shutil 
+from array import array
 try:
     from GPUmodules import env 
 except:
     import env 
 try:
-    from GPUmodules import PCImodule 
+    from GPUmodules import LOGmodule
 except:
-    import PCImodule 
+    import LOGmodule
+try:
+    from GPUmodules import RINGmodule
+except:
+    import RINGmodule
+
+
+class SYSFS_FILE:
+    """A sysfs/hwmon attribute file held open for repeated reads.
+
+       The file is opened once and re-read from offset 0 with pread into a reused buffer,
+       avoiding the stat/open/close sequence for every read of a sensor.
+    """
+    # Errors which indicate the underlying device node was replaced and must be reopened
+    reopen_errors = (errno.ENODEV, errno.ESTALE, errno.EBADF)
+
+    def __init__(self, file_path, buf_size=4096):
+        self.file_path = file_path
+        self.buf = bytearray(buf_size)
+        self.view = memoryview(self.buf)
+        self.fd = -1
+        self.open()
+
+    def open(self):
+        self.fd = os.open(self.file_path, os.O_RDONLY)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def pread(self):
+        if hasattr(os, "preadv"):
+            return(os.preadv(self.fd, [self.buf], 0))
+        data = os.pread(self.fd, len(self.buf), 0)
+        nbytes = len(data)
+        self.buf[:nbytes] = data
+        return(nbytes)
+
+    def read(self):
+        """Read full contents of the file, transparently reopening a stale file descriptor."""
+        try:
+            nbytes = self.pread()
+        except OSError as e:
+            if e.errno not in self.reopen_errors:
+                raise
+            self.close()
+            self.open()
+            nbytes = self.pread()
+        return(str(self.view[:nbytes], "utf-8"))
+
+    def readline(self):
+        """Read first line of the file, including the newline as with file.readline()."""
+        data = self.read()
+        nl_index = data.find("\n")
+        if nl_index < 0:
+            return(data)
+        return(data[:nl_index+1])
+
+    def __del__(self):
+        self.close()
+
+
+# Dynamic sensor values are stored as floats in a fixed layout array per GPU, NaN if not read
+SAMPLE_FIELDS = ("loading", "power", "power_cap", "energy", "temp", "vddgfx", "fan_enable", "fan_target",
+                 "fan_speed", "fan_pwm", "sclk_f", "sclk_ps", "mclk_f", "mclk_ps")
+SAMPLE_INDEX = {name: i for i, name in enumerate(SAMPLE_FIELDS)}
+# Dynamic string params published with samples in the sample ring
+RING_STR_FIELDS = ("ppm", "power_dpm_force", "link_spd", "link_wth")
+# Sample fields displayed as floats, all others are displayed as integers
+SAMPLE_FLOAT_FIELDS = ("power", "power_cap", "energy", "temp")
+NAN = float("nan")
+# Default deadband of logged sample fields, a value is only logged when it moves by more than this
+# from the last value logged.  Fields not listed are logged whenever they change.
+DEADBAND_DEFAULTS = {"loading": 2, "power": 2.0, "energy": 0.001, "temp": 1.0, "vddgfx": 10, "fan_speed": 50,
+                     "fan_pwm": 2, "sclk_f": 20, "mclk_f": 20}
+
+def parse_deadband(spec):
+    """Return deadbands from DEADBAND_DEFAULTS updated with a spec like "power=5,temp=2", or None if invalid."""
+    deadband = dict(DEADBAND_DEFAULTS)
+    for item in spec.split(","):
+        if not item.strip(): continue
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if name not in SAMPLE_INDEX:
+            print("Error: invalid deadband field [%s], must be one of: %s" % (name, ", ".join(SAMPLE_FIELDS)),
+                  file=sys.stderr)
+            return(None)
+        try:
+            deadband[name] = float(value)
+        except ValueError:
+            print("Error: invalid deadband value [%s] for %s" % (value, name), file=sys.stderr)
+            return(None)
+    return(deadband)
+
+# Decimals of the mean and of the min and max of table stats, tried in order until the stats fit a table cell
+STAT_DECIMALS = ((2, 2), (1, 1), (1, 0), (0, 0))
+
+def format_stat_value(value, decimals):
+    """Format a value with up to decimals decimal places, without trailing zeros."""
+    if decimals == 0:
+        return("%.0f" % value)
+    return(("%.*f" % (decimals, value)).rstrip("0").rstrip("."))
+
+def format_sample_value(name, value):
+    """Format a sample value for display, NaN is displayed as an empty string."""
+    if value != value:
+        return("")
+    if name in SAMPLE_FLOAT_FIELDS:
+        return(str(value))
+    return(str(int(value)))
+
+def get_pci_id():
+    """Return a PCI_ID object, importing PCImodule on first use.
+
+       PCI ID decode is only needed when static GPU details are not in the inventory cache.
+    """
+    try:
+        from GPUmodules import PCImodule
+    except:
+        import PCImodule
+    return(PCImodule.PCI_ID())
+
+def read_sysfs_value(file_path):
+    """Return the stripped first line of a sysfs file, or an empty string if it can't be read."""
+    try:
+        with open(file_path) as sysfs_file:
+            return(sysfs_file.readline().strip())
+    except OSError:
+        return("")
+
+def parse_int(value_str):
+    return(int(value_str))
+
+def parse_str(value_str):
+    return(value_str.strip())
+
+def parse_pwm_percent(value_str):
+    return(int(100*(int(value_str)/255)))
+
+def parse_pwm_mode(value_str):
+    pwm_mode_value = int(value_str)
+    pwm_mode_names = {0: "None", 1: "Manual", 2: "Dynamic"}
+    return([pwm_mode_value, pwm_mode_names.get(pwm_mode_value, "UNK")])
+
+def parse_dpm_state(value_str):
+    """Return (pstate, frequency in MHz) for the active line of a pp_dpm_*clk file.
+
+       Pstates which are not numbers, like the deep sleep state S, are returned as NaN.
+    """
+    for line in value_str.splitlines():
+        line = line.rstrip()
+        if line.endswith("*"):
+            lineitems = line.split(sep=':')
+            pstate = lineitems[0].strip()
+            frequency = int(lineitems[1].strip().rstrip('*').rstrip().rstrip("MHhz"))
+            return((int(pstate) if pstate.isdigit() else NAN, frequency))
+    return(None)
+
+def parse_ppm_mode(value_str):
+    """Return mode string like 1-3D_FULL_SCREEN for the active line of pp_power_profile_mode."""
+    for line in value_str.splitlines():
+        linestr = line.strip()
+        if "*:" in linestr:
+            return('-'.join(linestr.split(sep='*:')[0].split()))
+    return(None)
+
+
+class SENSOR_DEF:
+    """Declarative definition of a GPU driver file and how it maps to GPU_ITEM params.
+
+       params: target param name, or tuple of names when the parser returns a tuple
+       attr: file name, or tuple of file names read into a list (ranges)
+       root: "hwmon" or "card" directory the attr is found in
+       scale: divisor applied to the parsed value, cast: optional type applied after scaling
+       critical: card is not compatible if missing, otherwise the attr is just dropped from the plan
+       fan: only read if fans are shown, label: (file, value) that must match for attr to be used
+    """
+    __slots__ = ("params", "attr", "root", "parser", "scale", "cast", "critical", "fan", "label")
+
+    def __init__(self, params, attr, root="hwmon", parser=parse_int, scale=1, cast=None,
+                 critical=True, fan=False, label=None):
+        self.params = params
+        self.attr = attr
+        self.root = root
+        self.parser = parser
+        self.scale = scale
+        self.cast = cast
+        self.critical = critical
+        self.fan = fan
+        self.label = label
+
+    def convert(self, value_str):
+        value = self.parser(value_str)
+        if self.scale != 1:
+            value = value/self.scale
+        if self.cast is not None:
+            value = self.cast(value)
+        return(value)
+
+
+# Sensor schema, grouped by the GPU_ITEM read method that uses it
+GPU_SENSOR_SCHEMA = {
+    "static": (
+        SENSOR_DEF("power_cap_range", ("power1_cap_min", "power1_cap_max"), scale=1000000, cast=int),
+        SENSOR_DEF("temp_crit", "temp1_crit", scale=1000),
+        SENSOR_DEF("fan_speed_range", ("fan1_min", "fan1_max"), critical=False, fan=True),
+        SENSOR_DEF("fan_pwm_range", ("pwm1_min", "pwm1_max"), parser=parse_pwm_percent, fan=True)),
+    "sensor": (
+        SENSOR_DEF("power_cap", "power1_cap", scale=1000000),
+        SENSOR_DEF("power", "power1_average", scale=1000000),
+        SENSOR_DEF("temp", "temp1_input", scale=1000),
+        SENSOR_DEF("fan_enable", "fan1_enable", critical=False, fan=True),
+        SENSOR_DEF("fan_target", "fan1_target", critical=False, fan=True),
+        SENSOR_DEF("fan_speed", "fan1_input", critical=False, fan=True),
+        SENSOR_DEF("pwm_mode", "pwm1_enable", parser=parse_pwm_mode, fan=True),
+        SENSOR_DEF("fan_pwm", "pwm1", parser=parse_pwm_percent, fan=True),
+        SENSOR_DEF("vddgfx", "in0_input", label=("in0_label", "vddgfx"))),
+    "state": (
+        SENSOR_DEF("loading", "gpu_busy_percent", root="card"),
+        SENSOR_DEF("link_spd", "current_link_speed", root="card", parser=parse_str),
+        SENSOR_DEF("link_wth", "current_link_width", root="card", parser=parse_str),
+        SENSOR_DEF(("sclk_ps", "sclk_f"), "pp_dpm_sclk", root="card", parser=parse_dpm_state),
+        SENSOR_DEF(("mclk_ps", "mclk_f"), "pp_dpm_mclk", root="card", parser=parse_dpm_state),
+        SENSOR_DEF("ppm", "pp_power_profile_mode", root="card", parser=parse_ppm_mode),
+        SENSOR_DEF("power_dpm_force", "power_dpm_force_performance_level", root="card", parser=parse_str))
+    }
 
 
 class GPU_ITEM:
@@ -60,7 +288,9 @@ class GPU_ITEM:
         self.compatible = True
         time_0 = datetime.utcnow()
         self.energy = {"t0": time_0, "tn": time_0, "cummulative": 0.0}
-        self.hwmon_disabled = []
+        self.sysfs_files = {}
+        self.sensor_plan = {}
+        self.stats = {}  #{"power":[min, max, sum, count]}
 
         self.params = {
         "uuid" : item_id,
@@ -75,27 +305,13 @@ class GPU_ITEM:
         "model_display" : "",
         "card_path" : "",
         "hwmon_path" : "",
-        "energy": 0.0,
-        "power" : -1,
-        "power_cap" : -1,
         "power_cap_range" : [-1,-1],
-        "fan_enable" : -1,
         "pwm_mode" : [-1,"UNK"],
-        "fan_pwm" : -1,
-        "fan_speed" : -1,
         "fan_speed_range" : [-1,-1],
         "fan_pwm_range" : [-1,-1],
-        "fan_target" : -1,
-        "temp" : -1,
         "temp_crit" : -1,
-        "vddgfx" : -1,
         "vddc_range" : ["",""],
-        "loading" : -1,
-        "mclk_ps" : -1,
-        "mclk_f" : "",
         "mclk_f_range" : ["",""],
-        "sclk_ps" : -1,
-        "sclk_f" : "",
         "sclk_f_range" : ["",""],
         "link_spd" : "",
         "link_wth" : "",
@@ -119,6 +335,8 @@ class GPU_ITEM:
         "max_wg_size" : "",
         "prf_wg_multiple" : ""
         }
+        self.sample = array('d', [NAN]*len(SAMPLE_FIELDS))
+        self.sample[SAMPLE_INDEX["energy"]] = 0.0
         self.sclk_state = {} #{"1":["Mhz","mV"]}
         self.mclk_state = {} #{"1":["Mhz","mV"]}
         self.vddc_curve = {} #{"1":["Mhz","mV"]}
@@ -126,7 +344,10 @@ class GPU_ITEM:
         self.ppm_modes = {}  #{"1":["Name","Description"]}
 
     def set_params_value(self, name, value):
-        # update params dictionary
+        # update params dictionary, or sample array for dynamic sensor values
+        if name in SAMPLE_INDEX:
+            self.sample[SAMPLE_INDEX[name]] = value
+            return
         self.params[name] = value
         if name == "driver" and value != "amdgpu":
             self.compatible = False
@@ -138,9 +359,95 @@ class GPU_ITEM:
             self.hwmon_path = value
 
     def get_params_value(self, name):
-        # reads params dictionary
+        # reads params dictionary, or sample array for dynamic sensor values
+        if name in SAMPLE_INDEX:
+            return(self.sample[SAMPLE_INDEX[name]])
         return(self.params[name])
 
+    def format_params_value(self, name):
+        """Return param value as a string for display."""
+        if name in SAMPLE_INDEX:
+            return(format_sample_value(name, self.sample[SAMPLE_INDEX[name]]))
+        return(str(self.params[name]))
+
+    def update_stats(self, names):
+        """Accumulate min/max/sum/count of the current values of the named params."""
+        sample = self.sample
+        for name in names:
+            value = sample[SAMPLE_INDEX[name]]
+            if value != value:
+                continue
+            stat = self.stats.get(name)
+            if stat is None:
+                self.stats[name] = [value, value, value, 1]
+                continue
+            if value < stat[0]: stat[0] = value
+            if value > stat[1]: stat[1] = value
+            stat[2] += value
+            stat[3] += 1
+
+    def reset_stats(self):
+        self.stats = {}
+
+    def get_stats_value(self, name):
+        """Return [min, max, mean] of accumulated values of a param, or None if not accumulated."""
+        stat = self.stats.get(name)
+        if stat is None:
+            return(None)
+        return([stat[0], stat[1], stat[2]/stat[3]])
+
+    def get_log_values(self, names, aggregating):
+        """Return values of named log columns, the mean if aggregating, with min/max of accumulated params
+           for names ending with _min or _max.
+        """
+        values = []
+        for name in names:
+            if name.endswith(("_min", "_max")):
+                stat = self.get_stats_value(name[:-4])
+                values.append(NAN if stat is None else stat[0] if name.endswith("_min") else stat[1])
+                continue
+            stat = self.get_stats_value(name) if aggregating else None
+            if stat is not None:
+                values.append(stat[2])
+            elif name in SAMPLE_INDEX:
+                values.append(self.sample[SAMPLE_INDEX[name]])
+            else:
+                values.append(str(self.params[name]))
+        return(values)
+
+    def get_table_value(self, name):
+        """Return param as a table string, as mean [min,max] if more than one sample was accumulated.
+
+           Decimals are dropped, from min and max first, until the string fits in a table cell.
+        """
+        stat = self.stats.get(name)
+        if stat is None or stat[3] < 2:
+            return(self.format_params_value(name))
+        mean = stat[2]/stat[3]
+        for mean_decimals, range_decimals in STAT_DECIMALS:
+            value = "%s [%s,%s]" % (format_stat_value(mean, mean_decimals), format_stat_value(stat[0], range_decimals),
+                                    format_stat_value(stat[1], range_decimals))
+            if len(value) <= TABLE_CELL_WIDTH: break
+        return(value)
+
+    def get_sysfs_file(self, file_path):
+        """Return an open SYSFS_FILE for the given path, or None if it doesn't exist."""
+        sysfs_file = self.sysfs_files.get(file_path)
+        if sysfs_file is None:
+            try:
+                sysfs_file = SYSFS_FILE(file_path)
+            except FileNotFoundError:
+                return(None)
+            self.sysfs_files[file_path] = sysfs_file
+        return(sysfs_file)
+
+    def close_sysfs_files(self):
+        """Close the driver files of the GPU, as when it is not compatible, and drop plans using them."""
+        self.sensor_plan = {}
+        for sysfs_file in self.sysfs_files.values():
+            sysfs_file.close()
+        self.sysfs_files = {}
+
     def set_clinfo_value(self, name, value):
         # update clinfo dictionary
         self.clinfo[name] = value
@@ -191,10 +498,10 @@ class GPU_ITEM:
                 "link_spd" : "Link Speed",
                 "link_wth" : "Link Width",
                 "sclk_ps" : "Current SCLK P-State",
-                "sclk_f" : "Current SCLK",
+                "sclk_f" : "Current SCLK (MHz)",
                 "sclk_f_range" : "SCLK Range",
                 "mclk_ps" : "Current MCLK P-State",
-                "mclk_f" : "Current MCLK",
+                "mclk_f" : "Current MCLK (MHz)",
                 "mclk_f_range" : "MCLK Range",
                 "ppm" : "Power Performance Mode",
                 "power_dpm_force" : "Power Force Performance Level"
@@ -442,166 +749,116 @@ class GPU_ITEM:
                             print("Error: Invalid CURVE entry: %s" % (self.card_path + "pp_od_clk_voltage"), file=sys.stderr)
         card_file.close()
 
-    def read_gpu_sensor_static_data(self):
-        """Read GPU static data from HWMON path."""
-        try:
-            if(os.path.isfile(self.hwmon_path + "power1_cap_max") == True):
-                with open(self.hwmon_path + "power1_cap_max") as hwmon_file:
-                    power1_cap_max_value =  int(int(hwmon_file.readline())/1000000)
-                hwmon_file.close()
-                if(os.path.isfile(self.hwmon_path + "power1_cap_min") == True):
-                    with open(self.hwmon_path + "power1_cap_min") as hwmon_file:
-                        power1_cap_min_value =  int(int(hwmon_file.readline())/1000000)
-                    self.set_params_value("power_cap_range", [power1_cap_min_value, power1_cap_max_value])
-                else:
-                    print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "power1_cap_min"), file=sys.stderr)
-                hwmon_file.close()
-            else:
-                print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "power1_cap_max"), file=sys.stderr)
-                self.compatible = False
+    def compile_sensor_plan(self, group):
+        """Build the read plan for a GPU_SENSOR_SCHEMA group.
 
-            if(os.path.isfile(self.hwmon_path + "temp1_crit") == True):
-                with open(self.hwmon_path + "temp1_crit") as hwmon_file:
-                    self.set_params_value("temp_crit",  int(hwmon_file.readline())/1000)
-                hwmon_file.close()
+           Driver files are opened once here.  Missing files are reported and dropped, so
+           reading the plan never needs to check for file existence.
+        """
+        plan = []
+        for sensor_def in GPU_SENSOR_SCHEMA[group]:
+            if sensor_def.fan and env.gut_const.show_fans == False:
+                continue
+            if sensor_def.root == "hwmon":
+                root_path = self.hwmon_path
+                file_type = "HW"
             else:
-                print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "temp1_crit"), file=sys.stderr)
-                self.compatible = False
-
-            # Get fan data if --no_fan flag is not set
-            if env.gut_const.show_fans == True:
-                if(os.path.isfile(self.hwmon_path + "fan1_max") == True):
-                    with open(self.hwmon_path + "fan1_max") as hwmon_file:
-                        fan1_max_value =  int(hwmon_file.readline())
-                    hwmon_file.close()
-                    if(os.path.isfile(self.hwmon_path + "fan1_min") == True):
-                        with open(self.hwmon_path + "fan1_min") as hwmon_file:
-                            fan1_min_value =  int(hwmon_file.readline())
-                        self.set_params_value("fan_speed_range", [fan1_min_value, fan1_max_value])
-                    else:
-                        print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "fan1_min"), file=sys.stderr)
-                    hwmon_file.close()
-                else:
-                    print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "fan1_max"), file=sys.stderr)
-                    #self.compatible = False
-
-                if(os.path.isfile(self.hwmon_path + "pwm1_max") == True):
-                    with open(self.hwmon_path + "pwm1_max") as hwmon_file:
-                        pwm1_max_value =  int(100*(int(hwmon_file.readline())/255))
-                    hwmon_file.close()
-                    if(os.path.isfile(self.hwmon_path + "pwm1_min") == True):
-                        with open(self.hwmon_path + "pwm1_min") as hwmon_file:
-                            pwm1_pmin_value =  int(100*(int(hwmon_file.readline())/255))
-                        self.set_params_value("fan_pwm_range", [pwm1_pmin_value, pwm1_max_value])
-                        hwmon_file.close()
-                    else:
-                        print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "pwm1_min"), file=sys.stderr)
-                else:
-                    print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "pwm1_max"), file=sys.stderr)
+                root_path = self.card_path
+                file_type = "card"
+            if sensor_def.label:
+                label_file = self.get_sysfs_file(root_path + sensor_def.label[0])
+                if label_file is None:
+                    print("Error: %s file doesn't exist: %s" % (file_type, root_path + sensor_def.label[0]),
+                            file=sys.stderr)
                     self.compatible = False
-        except:
-            print("Error: problem reading static data from GPU HWMON: %s" % self.hwmon_path, file=sys.stderr)
-            self.compatible = False
-
-    def read_gpu_sensor_data(self):
-        """Read GPU sensor data from HWMON path."""
-        try:
-            if(os.path.isfile(self.hwmon_path + "power1_cap") == True):
-                with open(self.hwmon_path + "power1_cap") as hwmon_file:
-                    self.set_params_value("power_cap", int(hwmon_file.readline())/1000000)
-                hwmon_file.close()
-            else:
-                print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "power1_cap"), file=sys.stderr)
-                self.compatible = False
-    
-            if(os.path.isfile(self.hwmon_path + "power1_average") == True):
-                with open(self.hwmon_path + "power1_average") as hwmon_file:
-                    power_uw = int(hwmon_file.readline())
-                    time_n = datetime.utcnow()
-                    self.set_params_value("power", int(power_uw)/1000000)
-                    delta_hrs = ((time_n - self.energy["tn"]).total_seconds())/3600
-                    self.energy["tn"] = time_n
-                    self.energy["cummulative"] += delta_hrs * power_uw/1000000000
-                    self.set_params_value("energy", round(self.energy["cummulative"], 6))
-                hwmon_file.close()
-            else:
-                print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "power1_average"), file=sys.stderr)
-                self.compatible = False
-    
-            if(os.path.isfile(self.hwmon_path + "temp1_input") == True):
-                with open(self.hwmon_path + "temp1_input") as hwmon_file:
-                    self.set_params_value("temp",  int(hwmon_file.readline())/1000)
-                hwmon_file.close()
-            else:
-                print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "temp1_input"), file=sys.stderr)
-                self.compatible = False
-        except:
-            print("Error: Problem reading sensor [power/temp] from GPU HWMON: %s" % self.hwmon_path, file=sys.stderr)
-            self.compatible = False
-    
-        # Get fan data if --no_fan flag is not set
-        if env.gut_const.show_fans == True:
-            # First non-critical fan data 
-            # On error will be disabled, but still compatible
-            name_hwfile = ("fan1_enable", "fan1_target", "fan1_input")
-            name_param = ("fan_enable", "fan_target", "fan_speed")
-            for nh, np in zip(name_hwfile, name_param):
-                if (nh in self.hwmon_disabled) == False:
-                    if(os.path.isfile(self.hwmon_path + nh) == True):
-                       try:
-                            with open(self.hwmon_path + nh) as hwmon_file:
-                                self.set_params_value(np,  hwmon_file.readline().strip())
-                            hwmon_file.close()
-                       except:
-                           print("Warning: problem reading sensor [%s] data from GPU HWMON: %s" %
-                                   (nh, self.hwmon_path), file=sys.stderr)
-                           self.hwmon_disabled.append(nh)
+                    continue
+                if label_file.readline().strip() != sensor_def.label[1]:
+                    continue
+            attrs = sensor_def.attr if isinstance(sensor_def.attr, tuple) else (sensor_def.attr,)
+            sysfs_files = []
+            for attr in attrs:
+                sysfs_file = self.get_sysfs_file(root_path + attr)
+                if sysfs_file is None:
+                    if sensor_def.critical:
+                        print("Error: %s file doesn't exist: %s" % (file_type, root_path + attr), file=sys.stderr)
+                        self.compatible = False
                     else:
-                        print("Warning: HW file doesn't exist: %s" % (self.hwmon_path + nh), file=sys.stderr)
-                        self.hwmon_disabled.append(nh)
-
-            # Now critical fan data 
+                        print("Warning: %s file doesn't exist: %s" % (file_type, root_path + attr), file=sys.stderr)
+                    break
+                sysfs_files.append(sysfs_file)
+            else:
+                param_names = sensor_def.params if isinstance(sensor_def.params, tuple) else (sensor_def.params,)
+                targets = tuple((SAMPLE_INDEX.get(name, -1), name) for name in param_names)
+                if isinstance(sensor_def.attr, tuple):
+                    plan.append((sensor_def, tuple(sysfs_files), targets))
+                else:
+                    plan.append((sensor_def, sysfs_files[0], targets))
+        self.sensor_plan[group] = plan
+        return(plan)
+
+    def read_sensor_plan(self, group):
+        """Read all driver files in the compiled plan for a group and set params."""
+        plan = self.sensor_plan.get(group)
+        if plan is None:
+            plan = self.compile_sensor_plan(group)
+        params = self.params
+        sample = self.sample
+        disabled = []
+        for plan_item in plan:
+            sensor_def, sysfs_file, targets = plan_item
             try:
-                if(os.path.isfile(self.hwmon_path + "pwm1_enable") == True):
-                    with open(self.hwmon_path + "pwm1_enable") as hwmon_file:
-                        pwm_mode_value = int(hwmon_file.readline().strip())
-                        if pwm_mode_value == 0:
-                            pwm_mode_name = "None"
-                        elif pwm_mode_value == 1:
-                            pwm_mode_name = "Manual"
-                        elif pwm_mode_value == 2:
-                            pwm_mode_name = "Dynamic"
-                        self.set_params_value("pwm_mode", [pwm_mode_value, pwm_mode_name])
-                    hwmon_file.close()
+                if isinstance(sysfs_file, tuple):
+                    value = [sensor_def.convert(f.read()) for f in sysfs_file]
                 else:
-                    print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "pwm1_enable"), file=sys.stderr)
+                    value = sensor_def.convert(sysfs_file.read())
+            except (OSError, ValueError, IndexError):
+                if sensor_def.critical:
+                    print("Error: problem reading sensor [%s] data from GPU: %s" % (sensor_def.attr, self.card_path),
+                            file=sys.stderr)
                     self.compatible = False
-
-                if(os.path.isfile(self.hwmon_path + "pwm1") == True):
-                    with open(self.hwmon_path + "pwm1") as hwmon_file:
-                        self.set_params_value("fan_pwm",  int(100*(int(hwmon_file.readline())/255)))
-                    hwmon_file.close()
                 else:
-                    print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "pwm1"), file=sys.stderr)
-                    self.compatible = False
-            except:
-                print("Error: problem reading sensor [pwm] data from GPU HWMON: %s" % self.hwmon_path, file=sys.stderr)
-                print("Try running with --no_fan option", file=sys.stderr)
-                self.compatible = False
+                    print("Warning: problem reading sensor [%s] data from GPU: %s" % (sensor_def.attr, self.card_path),
+                            file=sys.stderr)
+                    disabled.append(plan_item)
+                continue
+            if value is None:
+                continue
+            if len(targets) == 1:
+                value = (value,)
+            for (sample_index, param_name), param_value in zip(targets, value):
+                if sample_index < 0:
+                    params[param_name] = param_value
+                else:
+                    sample[sample_index] = param_value
+        for plan_item in disabled:
+            plan.remove(plan_item)
+        if not self.compatible:
+            # Incompatible GPUs are no longer read
+            self.close_sysfs_files()
 
-        try:
-            if(os.path.isfile(self.hwmon_path + "in0_label") == True):
-                with open(self.hwmon_path + "in0_label") as hwmon_file:
-                    if hwmon_file.readline().rstrip() == "vddgfx":
-                        with open(self.hwmon_path + "in0_input") as hwmon_file2:
-                            self.set_params_value("vddgfx",  int(hwmon_file2.readline()))
-                        hwmon_file.close()
-            else:
-                print("Error: HW file doesn't exist: %s" % (self.hwmon_path + "in0_label"), file=sys.stderr)
-                self.compatible = False
-        except:
-            print("Error: problem reading sensor [in0_label] data from GPU HWMON: %s" % self.hwmon_path, file=sys.stderr)
-            self.compatible = False
+    def read_gpu_sensor_static_data(self):
+        """Read GPU static data from HWMON path."""
+        self.read_sensor_plan("static")
+        # Static files are only read once, so don't hold them open
+        for sensor_def, sysfs_file, targets in self.sensor_plan.pop("static", ()):
+            for f in (sysfs_file if isinstance(sysfs_file, tuple) else (sysfs_file,)):
+                self.sysfs_files.pop(f.file_path, None)
+                f.close()
+
+    def read_gpu_sensor_data(self, time_n=None):
+        """Read GPU sensor data from HWMON path.
+
+           time_n is the timestamp of the read, set by GPU_LIST when reading all GPUs as one frame.
+        """
+        if time_n is None:
+            time_n = datetime.utcnow()
+        self.read_sensor_plan("sensor")
+        power = self.sample[SAMPLE_INDEX["power"]]
+        if power == power:
+            delta_hrs = ((time_n - self.energy["tn"]).total_seconds())/3600
+            self.energy["tn"] = time_n
+            self.energy["cummulative"] += delta_hrs * power/1000
+            self.set_params_value("energy", round(self.energy["cummulative"], 6))
 
     def read_gpu_driver_info(self):
         """Read GPU current driver information from card path directory."""
@@ -640,7 +897,7 @@ class GPU_ITEM:
                 "subsystem_vendor":subsystem_vendor_id,"subsystem_device":subsystem_device_id})
             # use device info to set model
             if self.get_params_value("model_device_decode") == "UNDETERMINED":
-                pcid = PCImodule.PCI_ID()
+                pcid = get_pci_id()
                 self.set_params_value("model_device_decode", pcid.get_model(self.get_params_value("id")))
             # set display model to model_device_decode if shorter than model short
             if (self.get_params_value("model_device_decode") != "UNDETERMINED" and
@@ -662,82 +919,12 @@ class GPU_ITEM:
 
     def read_gpu_state_data(self):
         """Read GPU current state information from card path directory."""
-        try:
-            if(os.path.isfile(self.card_path + "gpu_busy_percent") == True):
-                with open(self.card_path + "gpu_busy_percent") as card_file:
-                    self.set_params_value("loading", int(card_file.readline()))
-                card_file.close()
-            else:
-                print("Error: card file doesn't exist: %s" % (self.card_path + "gpu_busy_percent"), file=sys.stderr)
-                self.compatible = False
-    
-            if(os.path.isfile(self.card_path + "current_link_speed") == True):
-                with open(self.card_path + "current_link_speed") as card_file:
-                    self.set_params_value("link_spd", card_file.readline().strip())
-                card_file.close()
-            else:
-                print("Error: card file doesn't exist: %s" % (self.card_path + "current_link_speed"), file=sys.stderr)
-                self.compatible = False
-    
-            if(os.path.isfile(self.card_path + "current_link_width") == True):
-                with open(self.card_path + "current_link_width") as card_file:
-                    self.set_params_value("link_wth", card_file.readline().strip())
-                card_file.close()
-            else:
-                print("Error: card file doesn't exist: %s" % (self.card_path + "current_link_width"), file=sys.stderr)
-                self.compatible = False
-    
-            if(os.path.isfile(self.card_path + "pp_dpm_sclk") == True):
-                with open(self.card_path + "pp_dpm_sclk") as card_file:
-                    for line in card_file:
-                        if line[len(line)-2] == "*":
-                            lineitems = line.split(sep=':')
-                            self.set_params_value("sclk_ps", lineitems[0].strip())
-                            self.set_params_value("sclk_f", lineitems[1].strip().strip('*'))
-                card_file.close()
-            else:
-                print("Error: card file doesn't exist: %s" % (self.card_path + "pp_dpm_sclk"), file=sys.stderr)
-                self.compatible = False
-    
-            if(os.path.isfile(self.card_path + "pp_dpm_mclk") == True):
-                with open(self.card_path + "pp_dpm_mclk") as card_file:
-                    for line in card_file:
-                        if line[len(line)-2] == "*":
-                            lineitems = line.split(sep=':')
-                            self.set_params_value("mclk_ps", lineitems[0].strip())
-                            self.set_params_value("mclk_f", lineitems[1].strip().strip('*'))
-                card_file.close()
-            else:
-                print("Error: card file doesn't exist: %s" % (self.card_path + "pp_dpm_mclk"), file=sys.stderr)
-                self.compatible = False
-    
-            if(os.path.isfile(self.card_path + "pp_power_profile_mode") == True):
-                with open(self.card_path + "pp_power_profile_mode") as card_file:
-                    for line in card_file:
-                        linestr = line.strip()
-                        searchObj = re.search('\*:', linestr)
-                        if(searchObj != None):
-                            lineitems = linestr.split(sep='*:')
-                            mode_str = lineitems[0].strip()
-                            mode_str = re.sub(r'[ ]+','-', mode_str)
-                            self.set_params_value("ppm", mode_str)
-                            break
-                card_file.close()
-            else:
-                print("Error: card file doesn't exist: %s" % (self.card_path + "pp_power_profile_mode"), file=sys.stderr)
-                self.compatible = False
-    
-            if(os.path.isfile(self.card_path + "power_dpm_force_performance_level") == True):
-                with open(self.card_path + "power_dpm_force_performance_level") as card_file:
-                    self.set_params_value("power_dpm_force", card_file.readline().strip())
-                card_file.close()
-            else:
-                print("Error: card file doesn't exist: %s" % (self.card_path + "power_dpm_force_performance_level"),
-                        file=sys.stderr)
-                self.compatible = False
-        except:
-            print("Error: getting data from GPU Card Path: %s" % self.card_path, file=sys.stderr)
-            self.compatible = False
+        self.read_sensor_plan("state")
+
+    def read_gpu_sample_data(self, time_n=None):
+        """Read all dynamic sensor and state data for the GPU."""
+        self.read_gpu_sensor_data(time_n)
+        self.read_gpu_state_data()
 
 
     def print_ppm_table(self):
@@ -774,7 +961,7 @@ class GPU_ITEM:
                     print(f"{__program_name__} Compatibility: Yes")
                 else:
                     print(f"{__program_name__} Compatibility: NO")
-            print(v +": "+ str(self.get_params_value(k)))
+            print(v +": "+ self.format_params_value(k))
         if clflag:
             for k, v in self.get_all_clinfo_labels().items():
                 print(v +": "+ str(self.get_clinfo_value(k)))
@@ -790,22 +977,171 @@ class GPU_ITEM:
         gpu_state["Time"] = str(self.energy["tn"].strftime('%c')).strip()
         gpu_state["Card#"] = int(self.card_num)
         for table_item in gpu_list.table_parameters:
-            gpu_state_str = str(re.sub('M[Hh]z','',str(self.get_params_value(table_item)))).strip()
-            if gpu_state_str.isnumeric():
-                gpu_state[table_item] = int(gpu_state_str)
-            elif re.fullmatch(r'[0-9]+.[0-9]*', gpu_state_str) or re.fullmatch(r'[0-9]*.[0-9]+', gpu_state_str):
-                gpu_state[table_item] = float(gpu_state_str)
-            elif gpu_state_str == '' or gpu_state_str == '-1' or gpu_state_str == 'NA' or gpu_state_str == None:
-                    new_line_item.append('NA')
-            else:
-                gpu_state[table_item] = gpu_state_str
+            gpu_state[table_item] = self.get_params_value(table_item)
         return(gpu_state)
 
 
+# Card and hwmon directory names, excluding connectors like card0-DP-1
+CARD_RE = re.compile(r'^card(\d+)/')
+HWMON_RE = re.compile(r'/hwmon\d+$')
+
+# clinfo --raw property names and the GPU_ITEM clinfo keys they set
+CLINFO_PARAMS = {
+    "CL_DEVICE_NAME": "device_name",
+    "CL_DEVICE_VERSION": "device_version",
+    "CL_DRIVER_VERSION": "driver_version",
+    "CL_DEVICE_OPENCL_C_VERSION": "opencl_version",
+    "CL_DEVICE_TOPOLOGY_AMD": "pcie_id",
+    "CL_DEVICE_MAX_COMPUTE_UNITS": "max_cu",
+    "CL_DEVICE_SIMD_PER_COMPUTE_UNIT_AMD": "simd_per_cu",
+    "CL_DEVICE_SIMD_WIDTH_AMD": "simd_width",
+    "CL_DEVICE_SIMD_INSTRUCTION_WIDTH_AMD": "simd_ins_width",
+    "CL_DEVICE_MAX_MEM_ALLOC_SIZE": "max_mem_allocation",
+    "CL_DEVICE_MAX_WORK_ITEM_DIMENSIONS": "max_wi_dim",
+    "CL_DEVICE_MAX_WORK_ITEM_SIZES": "max_wi_sizes",
+    "CL_DEVICE_MAX_WORK_GROUP_SIZE": "max_wg_size",
+    "CL_KERNEL_PREFERRED_WORK_GROUP_SIZE_MULTIPLE": "prf_wg_multiple",
+}
+CLINFO_TIMEOUT = 30
+
+def parse_clinfo(lines):
+    """Parse clinfo --raw output in a single pass.
+
+       return a dict of clinfo values for each device with a PCIe topology, keyed by pcie_id
+    """
+    devices = {}
+    for line in lines:
+        # Device lines are "[platform/device]  PROPERTY  value"
+        fields = line.split(None, 2)
+        if len(fields) < 3 or fields[0][0] != "[" or "/" not in fields[0]: continue
+        clinfo_name = CLINFO_PARAMS.get(fields[1])
+        if clinfo_name is None: continue
+        value = fields[2].strip()
+        if clinfo_name == "pcie_id":
+            # Topology is "PCI-E, 01:00.0"
+            value = value.split()[-1]
+            if env.gut_const.DEBUG: print(f"CL PCIE ID: [{value}]")
+        devices.setdefault(fields[0], {})[clinfo_name] = value
+    return({device["pcie_id"]: device for device in devices.values() if "pcie_id" in device})
+
+# Static params stored in the inventory cache, by the GPU_LIST method which reads them
+INVENTORY_PARAMS = {
+    "read_allgpu_pci_info": ("pcie_id", "driver", "model", "model_short"),
+    "read_gpu_driver_info": ("id", "model_device_decode", "model_display", "vbios"),
+    "read_gpu_sensor_static_data": ("power_cap_range", "temp_crit", "fan_speed_range", "fan_pwm_range"),
+}
+
+# Width of table label and GPU columns, and the escape sequences used to highlight cells
+TABLE_LABEL_WIDTH = 13
+TABLE_CELL_WIDTH = 16
+TABLE_HL = '\x1b[1;36m'
+TABLE_NORM = '\x1b[0m'
+
+def format_table_cell(value, width=TABLE_CELL_WIDTH):
+    return(value.ljust(width, ' ')[:width])
+
+def format_table_lines(rows):
+    """Return the lines of a box drawn table of rows from GPU_LIST.get_table_rows()."""
+    num_gpus = len(rows[0][1])
+    label_rule = "─"*TABLE_LABEL_WIDTH
+    cell_rule = "─"*TABLE_CELL_WIDTH
+    lines = ["┌" + label_rule + ("┬" + cell_rule)*num_gpus + "┐"]
+    for i, (label, values) in enumerate(rows):
+        line = ["│", TABLE_HL, format_table_cell(label, TABLE_LABEL_WIDTH), TABLE_NORM]
+        for value in values:
+            if i == 0:
+                line.extend(["│", TABLE_HL, format_table_cell(value), TABLE_NORM])
+            else:
+                line.extend(["│", format_table_cell(value)])
+        line.append("│")
+        lines.append("".join(line))
+        if i == 0:
+            lines.append("├" + label_rule + ("┼" + cell_rule)*num_gpus + "┤")
+    lines.append("└" + label_rule + ("┴" + cell_rule)*num_gpus + "┘")
+    return(lines)
+
+
+class TABLE_RENDERER:
+    """Draw the GPU table in a terminal with cursor addressing, rewriting only changed cells.
+
+       The first frame, and any frame after the terminal is resized or the layout changes, clears
+       the screen and is drawn in full.  Each frame is written to fd with a single write.
+    """
+    def __init__(self, fd=1):
+        self.fd = fd
+        self.header_lines = []
+        self.cells = None
+        self.redraw = True
+        self.bytes_written = 0
+        self.writes = 0
+        try:
+            signal.signal(signal.SIGWINCH, self.on_resize)
+        except ValueError:
+            # Not in the main thread
+            pass
+
+    def on_resize(self, signum, frame):
+        self.redraw = True
+
+    def render(self, gpu_list, header_lines=()):
+        """Draw the table of gpu_list below header_lines."""
+        rows = gpu_list.get_table_rows()
+        header_lines = list(header_lines)
+        cells = [[format_table_cell(value) for value in values] for label, values in rows]
+        if (self.redraw or self.cells is None or len(header_lines) != len(self.header_lines) or
+                len(cells) != len(self.cells) or len(cells[0]) != len(self.cells[0])):
+            self.redraw = False
+            out = "\x1b[H\x1b[2J" + "\n".join(header_lines + format_table_lines(rows)) + "\n"
+        else:
+            out = []
+            for i, (old_line, line) in enumerate(zip(self.header_lines, header_lines)):
+                if old_line != line:
+                    out.append("\x1b[%d;1H%s\x1b[K" % (i + 1, line))
+            # Card number row follows the top border, then parameter rows follow a separator
+            first_line = len(header_lines) + 2
+            for i, (old_row, row) in enumerate(zip(self.cells, cells)):
+                line_num = first_line + i + (1 if i else 0)
+                for j, (old_value, value) in enumerate(zip(old_row, row)):
+                    if old_value != value:
+                        col_num = TABLE_LABEL_WIDTH + 3 + j*(TABLE_CELL_WIDTH + 1)
+                        if i == 0: value = TABLE_HL + value + TABLE_NORM
+                        out.append("\x1b[%d;%dH%s" % (line_num, col_num, value))
+            if out:
+                out.append("\x1b[%d;1H" % (first_line + len(cells) + 2))
+            out = "".join(out)
+        self.header_lines = header_lines
+        self.cells = cells
+        if not out: return
+        data = out.encode("utf-8")
+        while data:
+            written = os.write(self.fd, data)
+            self.writes += 1
+            self.bytes_written += written
+            data = data[written:]
+
+
 class GPU_LIST:
     """A list of GPU_ITEMS indexed with uuid.  It also contains a table of parameters used for tabular printouts"""
     def __init__(self):
         self.list = {}
+        # Secondary indexes of uuid by card number and pcie_id, rebuilt when a lookup misses
+        self.card_num_index = {}
+        self.pcie_id_index = {}
+        self.executor = None
+        self.frame_time = None
+        self.stats_time = None
+        # SAMPLE_RING_READER when samples are read from amdgpu-sampler instead of the GPUs
+        self.sample_ring = None
+        self.sampler_stopped = False
+        self.plot_encoder = None
+        self.plot_sample_index = []
+        # Last logged values by card number and time of the last keyframe, for deadband logging
+        self.log_values = {}
+        self.log_keyframe_time = None
+        # Cached static params for the current boot and set of cards, loaded on first use
+        self.inventory = None
+        # Table parameters for which min/max/mean are shown when aggregating samples
+        self.stat_parameters = []
         if env.gut_const.show_fans == True:
             self.table_parameters = ["model_display", "loading", "power", "power_cap",
                     "energy",
@@ -824,27 +1160,48 @@ class GPU_LIST:
                     "energy":"Energy (kWh)",
                     "temp":"T (C)", "vddgfx":"VddGFX (mV)", "sclk_f":"Sclk (MHz)", "sclk_ps":"Sclk Pstate",
                     "mclk_f":"Mclk (MHz)", "mclk_ps":"Mclk Pstate", "ppm":"Perf Mode"}
+        for table_item in ["loading", "power", "temp", "vddgfx", "fan_pwm", "sclk_f", "mclk_f"]:
+            if table_item in self.table_parameters:
+                self.stat_parameters.append(table_item)
 
     def get_gpu_list(self):
         """ This method should be the first called to popultate the list with potentially compatible GPUs
             It doesn't read any driver files, just checks their existence and sets them in the GPU_ITEM object.
         """
-        for card_name in glob.glob(env.gut_const.card_root + "card?/device/pp_od_clk_voltage"):
+        card_names = {}
+        for card_name in glob.glob(env.gut_const.card_root + "card*/device/pp_od_clk_voltage"):
+            card_match = CARD_RE.match(os.path.relpath(card_name, env.gut_const.card_root))
+            if card_match: card_names[int(card_match.group(1))] = card_name
+        for card_num in sorted(card_names):
+            card_name = card_names[card_num]
             gpu_item = GPU_ITEM(uuid4().hex)
             gpu_item.set_params_value("card_path",  card_name.replace("pp_od_clk_voltage",''))
-            gpu_item.set_params_value("card_num", 
-                    card_name.replace("/device/pp_od_clk_voltage",'').replace(env.gut_const.card_root + "card", ''))
-            hw_file_srch = glob.glob(os.path.join(gpu_item.card_path, env.gut_const.hwmon_sub) +"?")
+            gpu_item.set_params_value("card_num", str(card_num))
+            hw_file_srch = [hw_file for hw_file in glob.glob(os.path.join(gpu_item.card_path, env.gut_const.hwmon_sub) + "*")
+                            if HWMON_RE.search(hw_file)]
             if len(hw_file_srch) > 1:
                 print("More than one hwmon file found: ", hw_file_srch)
             gpu_item.set_params_value("hwmon_path",  hw_file_srch[0] + "/")
-            self.list[gpu_item.uuid] = gpu_item
+            self.add_gpu(gpu_item)
+
+    def add_gpu(self, gpu_item):
+        self.list[gpu_item.uuid] = gpu_item
+        self.card_num_index[gpu_item.card_num] = gpu_item.uuid
+        self.pcie_id_index.clear()
+
+    def index_gpus(self):
+        """Rebuild the card number and pcie_id indexes from the list."""
+        self.card_num_index = {v.card_num: k for k, v in self.list.items()}
+        self.pcie_id_index = {v.get_params_value("pcie_id"): k for k, v in self.list.items()
+                              if v.get_params_value("pcie_id")}
 
     def list_compatible_gpus(self):
         compatible_list = GPU_LIST()
         for k, v in self.list.items():
             if v.compatible == True:
-                compatible_list.list[k]=v
+                compatible_list.add_gpu(v)
+            else:
+                v.close_sysfs_files()
         return(compatible_list)
 
     def get_gpu_card_list(self):
@@ -879,10 +1236,14 @@ class GPU_LIST:
                 v.read_gpu_state_data()
 
     def read_gpu_sensor_static_data(self):
-        """Read dynamic sensor data from GPUs"""
+        """Read static sensor data from GPUs, or from the inventory cache"""
+        # Fan ranges are only read when fans are shown
+        group = "read_gpu_sensor_static_data:" + ("fans" if env.gut_const.show_fans else "no_fans")
+        if self.load_inventory(group): return
         for k, v in self.list.items():
             if v.compatible:
                 v.read_gpu_sensor_static_data()
+        self.save_inventory(group)
 
     def read_gpu_sensor_data(self):
         """Read dynamic sensor data from GPUs"""
@@ -890,45 +1251,217 @@ class GPU_LIST:
             if v.compatible:
                 v.read_gpu_sensor_data()
 
+    def read_gpu_sample_data(self):
+        """Read dynamic sensor and state data from GPUs as a single frame.
+
+           All GPUs are stamped with the same frame time.  GPUs are read in parallel by a
+           thread pool with env.gut_const.workers threads, one per GPU if set to 0.
+        """
+        if self.sample_ring is not None:
+            self.read_sample_ring()
+            return
+        time_n = datetime.utcnow()
+        gpu_items = [v for v in self.list.values() if v.compatible]
+        num_workers = env.gut_const.workers if env.gut_const.workers > 0 else len(gpu_items)
+        if num_workers < 2 or len(gpu_items) < 2:
+            for v in gpu_items:
+                v.read_gpu_sample_data(time_n)
+        else:
+            if self.executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self.executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="gpu_sample")
+            for future in [self.executor.submit(v.read_gpu_sample_data, time_n) for v in gpu_items]:
+                future.result()
+        self.frame_time = time_n
+
+    def is_aggregating(self):
+        """Return True if more than one sample is taken per display/log update."""
+        return(env.gut_const.SAMPLE < env.gut_const.SLEEP)
+
+    def open_sample_ring(self, file_path):
+        """Open the ring file published by amdgpu-sampler and read samples from it.
+
+           return 0 if successful, else -1
+        """
+        try:
+            sample_ring = RINGmodule.SAMPLE_RING_READER(file_path)
+        except (OSError, ValueError) as err:
+            print("Error: can not open sample ring, is amdgpu-sampler running? %s" % err, file=sys.stderr)
+            return(-1)
+        return(self.set_sample_ring(sample_ring))
+
+    def set_sample_ring(self, sample_ring):
+        """Read samples from a ring file published by amdgpu-sampler instead of from the GPUs.
+
+           return 0 if the ring has samples of all compatible GPUs, else -1
+        """
+        if sample_ring.numeric_fields != SAMPLE_FIELDS:
+            print("Error: sample ring [%s] is from a different version of amdgpu-sampler" % sample_ring.file_path,
+                    file=sys.stderr)
+            return(-1)
+        for v in self.list.values():
+            if v.compatible and v.card_num not in sample_ring.card_index:
+                print("Error: sample ring [%s] has no samples for card%s" % (sample_ring.file_path, v.card_num),
+                        file=sys.stderr)
+                return(-1)
+        self.sample_ring = sample_ring
+        return(0)
+
+    def read_sample_ring(self):
+        """Set the sample of each GPU to the latest frame in the sample ring.
+
+           If amdgpu-sampler has stopped, samples are set to NaN until it is restarted.
+           return True if a new frame was read
+        """
+        frame = self.sample_ring.read_latest()
+        if frame is None:
+            if self.sample_ring.replaced():
+                # amdgpu-sampler was restarted
+                try:
+                    sample_ring = RINGmodule.SAMPLE_RING_READER(self.sample_ring.file_path)
+                except (OSError, ValueError) as err:
+                    print("Error: can not open restarted sample ring: %s" % err, file=sys.stderr)
+                    sys.exit(-1)
+                if self.set_sample_ring(sample_ring) < 0:
+                    sys.exit(-1)
+                self.sampler_stopped = False
+            elif not self.sampler_stopped and not self.sample_ring.writer_alive():
+                print("Warning: amdgpu-sampler stopped publishing to [%s], waiting for it to restart" %
+                        self.sample_ring.file_path, file=sys.stderr)
+                self.sampler_stopped = True
+                for v in self.list.values():
+                    if v.compatible:
+                        v.sample = array('d', [NAN]*len(SAMPLE_FIELDS))
+            return(False)
+        frame_num, epoch_ns, samples, card_strings = frame
+        time_n = LOGmodule.epoch_ns_to_datetime(epoch_ns)
+        self.sampler_stopped = False
+        for v in self.list.values():
+            if v.compatible:
+                card_index = self.sample_ring.card_index[v.card_num]
+                v.sample = samples[card_index]
+                v.params.update(card_strings[card_index])
+                v.energy["tn"] = time_n
+        self.frame_time = time_n
+        return(True)
+
+    def write_sample_ring(self, sample_ring):
+        """Publish the current sample of compatible GPUs, in sample_ring card order, to the sample ring."""
+        gpu_items = [self.list[self.find_gpu_by_card_num(card_num)] for card_num in sample_ring.cards]
+        sample_ring.write_frame(LOGmodule.datetime_to_epoch_ns(self.frame_time), [v.sample for v in gpu_items],
+                [[v.params.get(name, "") for name in RING_STR_FIELDS] for v in gpu_items])
+
+    def update_stats(self):
+        """Accumulate current sample into min/max/mean statistics of each GPU."""
+        # Don't accumulate the same frame twice, as when no new frame is in the sample ring
+        if self.frame_time is not None and self.frame_time == self.stats_time: return
+        self.stats_time = self.frame_time
+        for v in self.list.values():
+            if v.compatible:
+                v.update_stats(self.stat_parameters)
+
+    def reset_stats(self):
+        for v in self.list.values():
+            v.reset_stats()
+
+    def get_inventory_key(self):
+        """Return a key identifying the current boot and set of cards, or None if the boot can't be identified."""
+        boot_id = env.gut_const.read_boot_id()
+        if not boot_id: return(None)
+        cards = sorted([v.card_path, os.path.realpath(v.card_path), v.hwmon_path] for v in self.list.values())
+        return({"boot_id": boot_id, "cards": cards})
+
+    def load_inventory(self, group):
+        """Set the static params of an inventory group from the inventory cache.
+
+           return True if cached values were found for all GPUs, else False
+        """
+        if self.inventory is None:
+            self.inventory = {"key": self.get_inventory_key(), "groups": {}}
+            if self.inventory["key"] is None: return(False)
+            try:
+                with open(env.gut_const.inventory_file) as inventory_file:
+                    inventory = json.load(inventory_file)
+                if inventory.get("key") == self.inventory["key"]:
+                    self.inventory = inventory
+            except (OSError, ValueError):
+                pass
+        group_data = self.inventory["groups"].get(group)
+        if group_data is None or any(v.card_path not in group_data for v in self.list.values()):
+            return(False)
+        for v in self.list.values():
+            card_data = group_data[v.card_path]
+            for param_name in INVENTORY_PARAMS[group.split(":")[0]]:
+                v.set_params_value(param_name, card_data[param_name])
+            # Checks which failed in this run aren't overridden by the cache
+            v.compatible = v.compatible and card_data["compatible"]
+        if env.gut_const.DEBUG: print("Using inventory cache for %s" % group)
+        return(True)
+
+    def save_inventory(self, group):
+        """Store the static params of an inventory group and atomically write the inventory cache."""
+        if self.inventory is None or self.inventory["key"] is None: return
+        group_data = {}
+        for v in self.list.values():
+            card_data = {param_name: v.get_params_value(param_name) for param_name in INVENTORY_PARAMS[group.split(":")[0]]}
+            card_data["compatible"] = v.compatible
+            group_data[v.card_path] = card_data
+        self.inventory["groups"][group] = group_data
+        try:
+            env.write_atomic(env.gut_const.inventory_file, json.dumps(self.inventory))
+        except OSError as err:
+            if env.gut_const.DEBUG: print("Warning: can not write inventory cache [%s]: %s" % (env.gut_const.inventory_file, err))
+
     def read_gpu_driver_info(self):
-        """Read data static driver information for GPUs"""
+        """Read data static driver information for GPUs, or from the inventory cache"""
+        if self.load_inventory("read_gpu_driver_info"): return
         for k, v in self.list.items():
             if v.compatible:
                 v.read_gpu_driver_info()
+        self.save_inventory("read_gpu_driver_info")
 
     def read_allgpu_pci_info(self):
-        """ This function uses lspci to get details for GPUs in the current list and 
+        """ This function reads PCI device details from sysfs for GPUs in the current list and 
             populates the data structure of each GPU_ITEM in the list.
 
             It gets GPU name variants and gets the pcie slot ID for each card ID.
             Special incompatible cases are determined here, like the Fiji Pro Duo.
             This is the first function that should be called after the intial list is populated.
         """
-        pcie_ids = subprocess.check_output(
-            'lspci | grep -E \"^.*(VGA|Display).*\[AMD\/ATI\].*$\" | grep -Eo \"^([0-9a-fA-F]+:[0-9a-fA-F]+.[0-9a-fA-F])\"',
-            shell=True).decode().split()
-        if env.gut_const.DEBUG: print("Found %s GPUs" % len(pcie_ids))
-        for pcie_id in pcie_ids:
-            if env.gut_const.DEBUG: print("GPU: ", pcie_id)
-            lspci_items = subprocess.check_output("lspci -k -s " + pcie_id, shell=True).decode().split("\n")
-            if env.gut_const.DEBUG: print(lspci_items)
+        if self.load_inventory("read_allgpu_pci_info"): return
+        # Index cards by pcie slot ID, in lspci format without the default domain
+        card_index = {}
+        for k, v in self.list.items():
+            pci_slot = os.path.basename(os.path.realpath(v.card_path))
+            card_index[re.sub(r'^0000:', '', pci_slot)] = v
+        if env.gut_const.DEBUG: print("Card index: ", {k: v.card_num for k, v in card_index.items()})
 
-            #Get Long GPU Name
+        try:
+            pci_slots = sorted(os.listdir(env.gut_const.pci_root))
+        except OSError as err:
+            print("Error: can not read PCI devices [%s]: %s" % (env.gut_const.pci_root, err), file=sys.stderr)
+            return
+        pcid = get_pci_id()
+        for pci_slot in pci_slots:
+            pci_path = os.path.join(env.gut_const.pci_root, pci_slot)
+            # Only AMD VGA compatible and Display controllers
+            if not read_sysfs_value(os.path.join(pci_path, "class")).startswith(("0x0300", "0x0380")): continue
+            if read_sysfs_value(os.path.join(pci_path, "vendor")) != "0x1002": continue
+            pcie_id = re.sub(r'^0000:', '', pci_slot)
+            if env.gut_const.DEBUG: print("GPU: ", pcie_id)
+            v = card_index.get(pcie_id)
+            if v is None: continue
+
+            #Get Long GPU Name, from device and subsystem names
+            dev_id = {name: read_sysfs_value(os.path.join(pci_path, name))
+                      for name in ("vendor", "device", "subsystem_vendor", "subsystem_device")}
+            device_name, subsystem_name = pcid.get_names(dev_id)
+            gpu_name_0 = device_name or "UNKNOWN"
+            revision = read_sysfs_value(os.path.join(pci_path, "revision"))
+            if device_name and revision:
+                gpu_name_0 += " (rev %s)" % revision.replace('0x', '')
+            gpu_name_1 = subsystem_name or "UNKNOWN"
             gpu_name = ""
-            #Line 0 name
-            gpu_name_0 = ""
-            gpu_name_items = lspci_items[0].split('[AMD/ATI]')
-            if len(gpu_name_items) < 2:
-                gpu_name_0 = "UNKNOWN"
-            else:
-                gpu_name_0 = gpu_name_items[1]
-            #Line 1 name
-            gpu_name_1 = ""
-            gpu_name_items = lspci_items[1].split('[AMD/ATI]')
-            if len(gpu_name_items) < 2:
-                gpu_name_1 = "UNKNOWN"
-            else:
-                gpu_name_1 = gpu_name_items[1]
 
             #Check for Fiji ProDuo
             searchObj = re.search('Fiji', gpu_name_0)
@@ -945,149 +1478,86 @@ class GPU_LIST:
                 if env.gut_const.DEBUG: print("gpu_name: %s" % gpu_name)
 
             #Get Driver Name
-            driver_module_items = lspci_items[2].split(':')
-            if len(driver_module_items) < 2:
-                driver_module = "UNKNOWN"
+            driver_path = os.path.join(pci_path, "driver")
+            if os.path.islink(driver_path):
+                driver_module = os.path.basename(os.readlink(driver_path))
             else:
-                driver_module = driver_module_items[1].strip()
-
-            # Find matching card
-            device_dirs = glob.glob(env.gut_const.card_root + "card?/device")
-            for device_dir in device_dirs:
-                sysfspath = str(Path(device_dir).resolve())
-                if env.gut_const.DEBUG: print("device_dir: ", device_dir)
-                if env.gut_const.DEBUG: print("sysfspath: ", sysfspath)
-                if env.gut_const.DEBUG: print("pcie_id: ", pcie_id)
-                if env.gut_const.DEBUG: print("sysfspath-7: ", sysfspath[-7:])
-                if pcie_id == sysfspath[-7:]:
-                    for k, v in self.list.items():
-                        if v.card_path == device_dir + '/':
-                            if gpu_name == "Radeon Fiji Pro Duo": v.compatible = False
-                            v.set_params_value("pcie_id", pcie_id)
-                            v.set_params_value("driver",  driver_module)
-                            v.set_params_value("model", gpu_name)
-                            model_short = re.sub(r'^.*\[','', gpu_name)
-                            model_short = re.sub(r'\].*$','', model_short)
-                            model_short = re.sub(r'.*Radeon','', model_short)
-                            v.set_params_value("model_short",  model_short)
-                            break
-                    break
+                driver_module = "UNKNOWN"
 
-    def read_gpu_opencl_data(self):
+            if gpu_name == "Radeon Fiji Pro Duo": v.compatible = False
+            v.set_params_value("pcie_id", pcie_id)
+            v.set_params_value("driver",  driver_module)
+            v.set_params_value("model", gpu_name)
+            model_short = re.sub(r'^.*\[','', gpu_name)
+            model_short = re.sub(r'\].*$','', model_short)
+            model_short = re.sub(r'.*Radeon','', model_short)
+            v.set_params_value("model_short",  model_short)
+        self.save_inventory("read_allgpu_pci_info")
+
+    def get_clinfo_key(self):
+        """Return a key identifying the installed driver and OpenCL ICDs, which determine clinfo output."""
+        icds = []
+        for icd_file in sorted(glob.glob(os.path.join(env.gut_const.opencl_vendors, "*.icd"))):
+            try:
+                icd_stat = os.stat(icd_file)
+            except OSError:
+                continue
+            icds.append([icd_file, icd_stat.st_size, icd_stat.st_mtime_ns])
+        return({"driver_version": env.gut_const.read_amd_driver_version(), "icds": icds})
+
+    def read_clinfo(self):
+        """Run clinfo and return its parsed devices, or None if clinfo failed."""
         # Check access to clinfo command
         if shutil.which("/usr/bin/clinfo") == None:
             print("OS Command [clinfo] not found.  Use sudo apt-get install clinfo to install", file=sys.stderr)
-            return(-1)
-        cmd = subprocess.Popen(shlex.split('/usr/bin/clinfo --raw'), shell=False, stdout=subprocess.PIPE)
-        for line in cmd.stdout:
-            linestr = line.decode("utf-8").strip()
-            if len(linestr) < 1:
-                continue
-            if linestr[0] != "[":
-                continue
-            linestr = re.sub(r'   [ ]*',':-:', linestr)
-            searchObj = re.search('CL_DEVICE_NAME', linestr)
-            if(searchObj != None):
-                # Found a new device
-                tmp_gpu = GPU_ITEM(uuid4().hex)
-                lineItem = linestr.split(':-:')
-                dev_str = lineItem[0].split('/')[1]
-                dev_num = int(re.sub(']','',dev_str))
-                tmp_gpu.set_clinfo_value("device_name", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_DEVICE_VERSION', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                tmp_gpu.set_clinfo_value("device_version", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_DRIVER_VERSION', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                tmp_gpu.set_clinfo_value("driver_version", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_DEVICE_OPENCL_C_VERSION', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                tmp_gpu.set_clinfo_value("opencl_version", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_DEVICE_TOPOLOGY_AMD', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                pcie_id_str = (lineItem[2].split()[1]).strip()
-                if env.gut_const.DEBUG: print(f"CL PCIE ID: [{pcie_id_str}]")
-                tmp_gpu.set_clinfo_value("pcie_id", pcie_id_str)
-                continue
-            searchObj = re.search('CL_DEVICE_MAX_COMPUTE_UNITS', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                tmp_gpu.set_clinfo_value("max_cu", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_DEVICE_SIMD_PER_COMPUTE_UNIT_AMD', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                tmp_gpu.set_clinfo_value("simd_per_cu", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_DEVICE_SIMD_WIDTH_AMD', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                tmp_gpu.set_clinfo_value("simd_width", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_DEVICE_SIMD_INSTRUCTION_WIDTH_AMD', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                tmp_gpu.set_clinfo_value("simd_ins_width", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_DEVICE_MAX_MEM_ALLOC_SIZE', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                tmp_gpu.set_clinfo_value("max_mem_allocation", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_DEVICE_MAX_WORK_ITEM_DIMENSIONS', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                tmp_gpu.set_clinfo_value("max_wi_dim", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_DEVICE_MAX_WORK_ITEM_SIZES', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                tmp_gpu.set_clinfo_value("max_wi_sizes", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_DEVICE_MAX_WORK_GROUP_SIZE', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                tmp_gpu.set_clinfo_value("max_wg_size", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_KERNEL_PREFERRED_WORK_GROUP_SIZE_MULTIPLE', linestr)
-            if(searchObj != None):
-                lineItem = linestr.split(':-:')
-                tmp_gpu.set_clinfo_value("prf_wg_multiple", lineItem[2].strip())
-                continue
-            searchObj = re.search('CL_DEVICE_EXTENSIONS', linestr)
-            if(searchObj != None):
-                # End of Device 
-                if env.gut_const.DEBUG: print("finding gpu with pcie ID: ", tmp_gpu.get_clinfo_value("pcie_id"))
-                target_gpu_uuid = self.find_gpu_by_pcie_id(tmp_gpu.get_clinfo_value("pcie_id"))
-                self.list[target_gpu_uuid].copy_clinfo_values(tmp_gpu)
+            return(None)
+        try:
+            cmd = subprocess.run(shlex.split('/usr/bin/clinfo --raw'), shell=False, stdout=subprocess.PIPE,
+                                 timeout=CLINFO_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            print("Error: clinfo did not complete within %d seconds" % CLINFO_TIMEOUT, file=sys.stderr)
+            return(None)
+        return(parse_clinfo(cmd.stdout.decode("utf-8", errors="replace").splitlines()))
+
+    def read_gpu_opencl_data(self):
+        """Set clinfo values of GPUs from clinfo, or from the clinfo cache for the installed driver"""
+        clinfo_key = self.get_clinfo_key()
+        devices = None
+        try:
+            with open(env.gut_const.clinfo_cache_file) as clinfo_file:
+                clinfo_cache = json.load(clinfo_file)
+            if clinfo_cache.get("key") == clinfo_key:
+                devices = clinfo_cache["devices"]
+                if env.gut_const.DEBUG: print("Using clinfo cache")
+        except (OSError, ValueError, KeyError):
+            pass
+        if devices is None:
+            devices = self.read_clinfo()
+            if devices is None: return(-1)
+            try:
+                env.write_atomic(env.gut_const.clinfo_cache_file, json.dumps({"key": clinfo_key, "devices": devices}))
+            except OSError as err:
+                if env.gut_const.DEBUG: print("Warning: can not write clinfo cache [%s]: %s" % (env.gut_const.clinfo_cache_file, err))
+        for v in self.list.values():
+            device = devices.get(v.get_params_value("pcie_id"))
+            if device is not None:
+                v.clinfo.update(device)
         return(0)
 
     def find_gpu_by_pcie_id(self, pcie_id):
-        for k, v in self.list.items():
-            if v.get_params_value("pcie_id") == pcie_id:
-                return(v.uuid)
-        return(-1)
+        if pcie_id not in self.pcie_id_index: self.index_gpus()
+        return(self.pcie_id_index.get(pcie_id, -1))
+
+    def find_gpu_by_card_num(self, card_num):
+        card_num = str(card_num)
+        if card_num not in self.card_num_index: self.index_gpus()
+        return(self.card_num_index.get(card_num, -1))
 
     def num_gpus(self):
-        cnt = 0
-        for k, v in self.list.items():
-            cnt += 1
-        return(cnt)
+        return(len(self.list))
 
     def num_compatible_gpus(self):
-        cnt = 0
-        for k, v in self.list.items():
-            if v.compatible == True:
-                cnt += 1
-        return(cnt)
+        return(sum(1 for v in self.list.values() if v.compatible == True))
 
     def print(self, clflag=False):
         for k, v in self.list.items():
@@ -1096,61 +1566,169 @@ class GPU_LIST:
     def num_table_rows(self):
         return(len(self.table_parameters))
 
+    def get_table_rows(self):
+        """Return the table as rows of (label, [value of each GPU]), starting with the card number row."""
+        gpu_items = list(self.list.values())
+        rows = [("Card #", ["card" + v.get_params_value("card_num") for v in gpu_items])]
+        for table_item in self.table_parameters:
+            rows.append((self.table_param_labels[table_item], [v.get_table_value(table_item) for v in gpu_items]))
+        return(rows)
+
     def print_table(self):
         num_gpus = self.num_gpus()
         if num_gpus < 1: return(-1)
+        print("\n".join(format_table_lines(self.get_table_rows())))
 
-        print("┌", "─".ljust(13,'─'), sep="", end="")
-        for k, v in self.list.items():
-                print("┬", "─".ljust(16,'─'), sep="", end="")
-        print("┐")
-
-        print("│", '\x1b[1;36m'+"Card #".ljust(13,' ')+'\x1b[0m', sep="", end="")
-        for k, v in self.list.items():
-            print("│", '\x1b[1;36m'+("card"+ v.get_params_value("card_num")).ljust(16,' ') + '\x1b[0m', sep="", end="")
-        print("│")
-
-        print("├", "─".ljust(13,'─'), sep="", end="")
-        for k, v in self.list.items():
-                print("┼", "─".ljust(16,'─'), sep="", end="")
-        print("┤")
-
+    def get_log_header(self):
+        """Return the log header line, with min/max columns if aggregating samples."""
+        header = ["Time|Card#"]
         for table_item in self.table_parameters:
-            print("│", '\x1b[1;36m'+self.table_param_labels[table_item].ljust(13,' ')[:13]+'\x1b[0m', sep="", end="")
-            for k, v in self.list.items():
-                print("│", str(v.get_params_value(table_item)).ljust(16,' ')[:16], sep="", end="")
-            print("│")
+            header.append("|" + table_item)
+        if self.is_aggregating():
+            for table_item in self.stat_parameters:
+                header.append("|" + table_item + "_min|" + table_item + "_max")
+        # Marks a deadband log, where values within the deadband are written as LOG_UNCHANGED
+        if env.gut_const.log_deadband is not None:
+            header.append("|" + LOGmodule.LOG_UNCHANGED)
+        header.append("\n")
+        return("".join(header))
+
+    def is_log_keyframe(self):
+        """Return True if all values are to be logged, as at the first frame and every log_keyframe seconds."""
+        frame_time = self.frame_time or max(v.energy["tn"] for v in self.list.values())
+        if (self.log_keyframe_time is None or
+                (frame_time - self.log_keyframe_time).total_seconds() >= env.gut_const.log_keyframe):
+            self.log_keyframe_time = frame_time
+            return(True)
+        return(False)
 
-        print("└", "─".ljust(13,'─'), sep="", end="")
-        for k, v in self.list.items():
-                print("┴", "─".ljust(16,'─'), sep="", end="")
-        print("┘")
+    def get_log_deadbands(self, names):
+        """Return the deadband of each named log column, min/max columns using the deadband of their field."""
+        deadband = env.gut_const.log_deadband
+        return([deadband.get(name[:-4] if name.endswith(("_min", "_max")) else name, 0) for name in names])
+
+    def get_log_changes(self, card_num, names, deadbands, values, keyframe):
+        """Return a list of True for each value to be logged, False if it is within the deadband of the last
+           value logged for the card.  The last logged values are updated.
+        """
+        last_values = self.log_values.setdefault(card_num, {})
+        changes = []
+        for name, deadband, value in zip(names, deadbands, values):
+            last_value = last_values.get(name, None)
+            if keyframe or last_value is None:
+                changed = True
+            elif isinstance(value, str) or isinstance(last_value, str):
+                changed = value != last_value
+            elif value != value or last_value != last_value:
+                changed = (value == value) or (last_value == last_value)
+            else:
+                changed = abs(value - last_value) > deadband
+            if changed: last_values[name] = value
+            changes.append(changed)
+        return(changes)
 
     def print_log_header(self, log_file_ptr):
         num_gpus = self.num_gpus()
         if num_gpus < 1: return(-1)
-
-        #Print Header
-        print("Time|Card#", end="", file=log_file_ptr )
-        for table_item in self.table_parameters:
-            print("|" + table_item, end="", file=log_file_ptr)
-        print("", file=log_file_ptr)
+        log_file_ptr.write(self.get_log_header())
+
+    def get_column_log_schema(self):
+        """Return (numeric fields, string fields, cards) of the column log, with min/max columns if aggregating."""
+        numeric_fields = [p for p in self.table_parameters if p in SAMPLE_INDEX]
+        if self.is_aggregating():
+            for table_item in self.stat_parameters:
+                numeric_fields.extend([table_item + "_min", table_item + "_max"])
+        string_fields = [p for p in self.table_parameters if p not in SAMPLE_INDEX]
+        cards = [{"card_num": v.card_num, "pcie_id": v.get_params_value("pcie_id"),
+                  "model": v.get_params_value("model_display"), "vbios": v.get_params_value("vbios")}
+                 for v in self.list.values()]
+        return(numeric_fields, string_fields, cards)
+
+    def write_column_log(self, column_log):
+        """Write the current samples, or mean and min/max if aggregating, as a frame of the column log."""
+        aggregating = self.is_aggregating()
+        frame_time = self.frame_time or max(v.energy["tn"] for v in self.list.values())
+        deadband = env.gut_const.log_deadband is not None
+        if deadband:
+            keyframe = self.is_log_keyframe()
+            deadbands = self.get_log_deadbands(column_log.numeric_fields)
+        records = []
+        for card in column_log.cards:
+            v = self.list[self.find_gpu_by_card_num(card["card_num"])]
+            values = v.get_log_values(column_log.numeric_fields, aggregating)
+            if deadband:
+                # Values within the deadband repeat the last logged value, so columns compact to constants
+                changes = self.get_log_changes(v.card_num, column_log.numeric_fields, deadbands, values, keyframe)
+                last_values = self.log_values[v.card_num]
+                values = [value if changed else last_values[name]
+                          for name, value, changed in zip(column_log.numeric_fields, values, changes)]
+            records.append((values, [v.params.get(name, "") for name in column_log.string_fields]))
+        column_log.write_frame(LOGmodule.datetime_to_epoch_ns(frame_time), records)
 
     def print_log(self, log_file_ptr):
         num_gpus = self.num_gpus()
         if num_gpus < 1: return(-1)
+        if env.gut_const.LOG_BINARY:
+            self.write_column_log(log_file_ptr)
+            return
 
-        #Print Data
-        for k, v in self.list.items():
-            print(str(v.energy["tn"].strftime('%c')).strip() + "|" + str(v.card_num), sep='', end="", file=log_file_ptr)
-            for table_item in self.table_parameters:
-                print("|", re.sub('M[Hh]z','',str(v.get_params_value(table_item)).strip()), sep='', end="", file=log_file_ptr)
-            print("", file=log_file_ptr)
+        #Print Data, using mean values followed by min/max columns if aggregating samples
+        #All GPUs are written as one block
+        aggregating = self.is_aggregating()
+        fields = [(table_item, SAMPLE_INDEX.get(table_item)) for table_item in self.table_parameters]
+        deadband = env.gut_const.log_deadband is not None
+        if deadband:
+            keyframe = self.is_log_keyframe()
+            names = list(self.table_parameters)
+            if aggregating:
+                for table_item in self.stat_parameters:
+                    names.extend([table_item + "_min", table_item + "_max"])
+            deadbands = self.get_log_deadbands(names)
+        time_strs = {}
+        lines = []
+        for v in self.list.values():
+            # GPUs read as one frame share the time, so it is only formatted once
+            time_n = v.energy["tn"]
+            time_str = time_strs.get(time_n)
+            if time_str is None:
+                time_str = time_strs[time_n] = time_n.strftime('%c').strip()
+            line = []
+            sample = v.sample
+            for table_item, sample_index in fields:
+                stats = v.get_stats_value(table_item) if aggregating else None
+                if stats:
+                    line.append(str(round(stats[2], 3)))
+                elif sample_index is None:
+                    line.append(str(v.params[table_item]))
+                else:
+                    line.append(format_sample_value(table_item, sample[sample_index]))
+            if aggregating:
+                for table_item in self.stat_parameters:
+                    stats = v.get_stats_value(table_item)
+                    if stats:
+                        line.extend([str(stats[0]), str(stats[1])])
+                    else:
+                        line.extend(["", ""])
+            if deadband:
+                changes = self.get_log_changes(v.card_num, names, deadbands, v.get_log_values(names, aggregating), keyframe)
+                line = [item if changed else LOGmodule.LOG_UNCHANGED for item, changed in zip(line, changes)]
+            lines.append("|".join([time_str, str(v.card_num)] + line))
+        lines.append("")
+        log_file_ptr.write("\n".join(lines))
 
     def print_plot_header(self, log_file_ptr):
         num_gpus = self.num_gpus()
         if num_gpus < 1: return(-1)
 
+        if env.gut_const.PLOT_BINARY:
+            # Sample array values are packed as numeric fields, all others as strings
+            self.plot_encoder = LOGmodule.PLOT_STREAM_ENCODER(
+                    [p for p in self.table_parameters if p in SAMPLE_INDEX],
+                    [p for p in self.table_parameters if p not in SAMPLE_INDEX])
+            self.plot_sample_index = [SAMPLE_INDEX[p] for p in self.plot_encoder.numeric_fields]
+            log_file_ptr.write(self.plot_encoder.header_bytes())
+            return
+
         #Print Header
         line_str_item = []
         line_str_item.append("Time|Card#")
@@ -1164,12 +1742,24 @@ class GPU_LIST:
         num_gpus = self.num_gpus()
         if num_gpus < 1: return(-1)
 
+        if self.plot_encoder:
+            # Write all GPUs as one frame with a single timestamp
+            encoder = self.plot_encoder
+            frame_time = self.frame_time or max(v.energy["tn"] for v in self.list.values())
+            records = []
+            for k, v in self.list.items():
+                sample = v.sample
+                records.append((int(v.card_num), [sample[i] for i in self.plot_sample_index],
+                                [v.format_params_value(p) for p in encoder.string_fields]))
+            log_file_ptr.write(encoder.frame_bytes(LOGmodule.datetime_to_epoch_ns(frame_time), records))
+            return
+
         #Print Data
         for k, v in self.list.items():
             line_str_item = []
             line_str_item.append(str(v.energy["tn"].strftime('%c')).strip() + "|" + str(v.card_num))
             for table_item in self.table_parameters:
-                line_str_item.append("|"+ str(re.sub('M[Hh]z','',str(v.get_params_value(table_item)))).strip())
+                line_str_item.append("|" + v.format_params_value(table_item))
             line_str_item.append("\n")
             line_str = ''.join(line_str_item)
             log_file_ptr.write(line_str.encode("utf-8"))
@@ -0,0 +1,828 @@
+#!/usr/bin/env python3
+"""LOGmodule  -  GPU log writer and binary encodings of GPU plot data
+
+    Log writers and readers, and the plot stream written by amdgpu-monitor to amdgpu-plot.
+    The binary formats are described in docs/USER_GUIDE.md.
+
+    Copyright (C) 2019  RueiKe
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+__author__ = "RueiKe"
+__copyright__ = "Copyright (C) 2019 RueiKe"
+__credits__ = [""]
+__license__ = "GNU General Public License"
+__program_name__ = "amdgpu-utils"
+__version__ = "v2.5.0"
+__maintainer__ = "RueiKe"
+__status__ = "Stable Release"
+
+import os
+import sys
+import time
+import mmap
+import gzip
+import lzma
+import atexit
+import shutil
+import json
+import array
+import bisect
+import struct
+import threading
+from datetime import datetime, timedelta
+try:
+    from GPUmodules import env
+except:
+    import env
+
+# First byte is not printable, so a binary stream can't be mistaken for a text header
+PLOT_STREAM_MAGIC = b"\x89AGUPLT1"
+PLOT_HEADER_COUNTS = struct.Struct("<HH")
+PLOT_FRAME_HEADER = struct.Struct("<IqH")
+PLOT_STR_LEN = struct.Struct("<H")
+EPOCH = datetime(1970, 1, 1)
+COLUMN_LOG_MAGIC = b"\x89AGULOG1"
+COLUMN_LOG_HEADER_LEN = struct.Struct("<I")
+COLUMN_CHUNK_MAGIC = b"CHNK"
+COLUMN_CHUNK_HEADER = struct.Struct("<4sIIIqq")
+BIG_ENDIAN = sys.byteorder == "big"
+# Value written in a deadband text log in place of a value unchanged since the last line of the card
+LOG_UNCHANGED = "="
+# Number of logs with a text log index kept in the index file
+LOG_INDEX_ENTRIES = 16
+# Compressors for rotated log segments, by name: (file suffix, open function)
+LOG_COMPRESSORS = {"gzip": (".gz", gzip.open), "xz": (".xz", lzma.open), "none": ("", None)}
+
+
+def pad8(data):
+    return(data + b"\0"*(-len(data) % 8))
+
+def open_log_file(file_path):
+    """Return (open file, contents) of a log file, with the contents memory mapped, or None and
+       the decompressed contents if it is a compressed segment.
+    """
+    for compress_suffix, compress_open in LOG_COMPRESSORS.values():
+        if compress_open is not None and file_path.endswith(compress_suffix):
+            with compress_open(file_path, "rb") as log_file:
+                return((None, log_file.read()))
+    log_file = open(file_path, "rb")
+    return((log_file, map_log_file(log_file)))
+
+def map_log_file(log_file, data=b""):
+    """Return the contents of an open log file memory mapped.
+
+       If data holds the previous contents, it is returned unless the file has grown.  The file
+       is mapped through the open file, so a log which was rotated away is still read to its end.
+    """
+    if os.fstat(log_file.fileno()).st_size > len(data):
+        return(mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ))
+    return(data)
+
+def log_file_rotated(file_path, log_file, data):
+    """Return True if file_path is no longer the open log_file with contents data, as when the log
+       was rotated into a segment and a new log started, or was truncated.
+    """
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        # Between the rename and the creation of the new log
+        return(False)
+    return(file_stat.st_ino != os.fstat(log_file.fileno()).st_ino or file_stat.st_size < len(data))
+
+def datetime_to_epoch_ns(time_n):
+    """Convert a naive UTC datetime to integer ns since the epoch."""
+    return((time_n - EPOCH) // timedelta(microseconds=1) * 1000)
+
+def epoch_ns_to_datetime(epoch_ns):
+    """Convert integer ns since the epoch to a naive UTC datetime."""
+    return(EPOCH + timedelta(microseconds=epoch_ns // 1000))
+
+
+class PLOT_STREAM_ENCODER:
+    """Encode a schema header and frames of plot data records."""
+    def __init__(self, numeric_fields, string_fields):
+        self.numeric_fields = tuple(numeric_fields)
+        self.string_fields = tuple(string_fields)
+        self.record_struct = struct.Struct("<H%dd" % len(self.numeric_fields))
+
+    def header_bytes(self):
+        header = [PLOT_STREAM_MAGIC, PLOT_HEADER_COUNTS.pack(len(self.numeric_fields), len(self.string_fields))]
+        for name in self.numeric_fields + self.string_fields:
+            name_bytes = name.encode("utf-8")
+            header.append(struct.pack("<B", len(name_bytes)))
+            header.append(name_bytes)
+        return(b''.join(header))
+
+    def frame_bytes(self, epoch_ns, records):
+        """Return a frame for records, a list of (card_num, numeric values, string values)."""
+        frame = []
+        for card_num, numeric_values, string_values in records:
+            frame.append(self.record_struct.pack(card_num, *numeric_values))
+            for value in string_values:
+                value_bytes = value.encode("utf-8")
+                frame.append(PLOT_STR_LEN.pack(len(value_bytes)))
+                frame.append(value_bytes)
+        payload = b''.join(frame)
+        return(PLOT_FRAME_HEADER.pack(len(payload), epoch_ns, len(records)) + payload)
+
+
+class PLOT_STREAM_DECODER:
+    """Decode a plot stream fed in arbitrary pieces.
+
+       feed() buffers incomplete data and returns the frames completed by it, each as
+       (epoch_ns, [(card_num, numeric values tuple, string values tuple), ...]).
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.numeric_fields = None
+        self.string_fields = None
+        self.record_struct = None
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        offset = 0
+        buffer = self.buffer
+        if self.record_struct is None:
+            offset = self.read_header()
+            if offset == 0: return(frames)
+        while len(buffer) - offset >= PLOT_FRAME_HEADER.size:
+            payload_len, epoch_ns, num_records = PLOT_FRAME_HEADER.unpack_from(buffer, offset)
+            frame_end = offset + PLOT_FRAME_HEADER.size + payload_len
+            if len(buffer) < frame_end: break
+            offset += PLOT_FRAME_HEADER.size
+            records = []
+            for _ in range(num_records):
+                values = self.record_struct.unpack_from(buffer, offset)
+                offset += self.record_struct.size
+                string_values = []
+                for _ in self.string_fields:
+                    (str_len,) = PLOT_STR_LEN.unpack_from(buffer, offset)
+                    offset += PLOT_STR_LEN.size
+                    string_values.append(bytes(buffer[offset:offset+str_len]).decode("utf-8"))
+                    offset += str_len
+                records.append((values[0], values[1:], tuple(string_values)))
+            frames.append((epoch_ns, records))
+            offset = frame_end
+        del buffer[:offset]
+        return(frames)
+
+    def read_header(self):
+        """Parse the schema header from the buffer, returning its length or 0 if incomplete."""
+        buffer = self.buffer
+        offset = len(PLOT_STREAM_MAGIC)
+        if len(buffer) < offset + PLOT_HEADER_COUNTS.size: return(0)
+        if bytes(buffer[:offset]) != PLOT_STREAM_MAGIC:
+            raise ValueError("Not a plot stream")
+        num_numeric, num_string = PLOT_HEADER_COUNTS.unpack_from(buffer, offset)
+        offset += PLOT_HEADER_COUNTS.size
+        names = []
+        for _ in range(num_numeric + num_string):
+            if len(buffer) < offset + 1: return(0)
+            name_len = buffer[offset]
+            offset += 1
+            if len(buffer) < offset + name_len: return(0)
+            names.append(bytes(buffer[offset:offset+name_len]).decode("utf-8"))
+            offset += name_len
+        self.numeric_fields = tuple(names[:num_numeric])
+        self.string_fields = tuple(names[num_numeric:])
+        self.record_struct = struct.Struct("<H%dd" % num_numeric)
+        return(offset)
+
+
+class LOG_WRITER:
+    """Write log lines through a buffer that is flushed with a single write when it holds
+       flush_bytes or is flush_seconds old.
+
+       The log file is rotated when it reaches rotate_bytes or is rotate_seconds old, 0 to
+       disable either.  The rotated segment is renamed to <name>.<n><ext> and compressed in
+       the background, and the new file starts with header, so each segment is a complete log.
+       The buffer is flushed at exit.
+    """
+    def __init__(self, file_path, header="", flush_seconds=10, flush_bytes=1<<16, rotate_bytes=1<<26,
+                 rotate_seconds=86400, compress="gzip"):
+        self.file_path = file_path
+        self.header = header
+        self.flush_seconds = flush_seconds
+        self.flush_bytes = flush_bytes
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress_suffix, self.compress_open = LOG_COMPRESSORS[compress]
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.segment = 0
+        self.fd = -1
+        self.compress_threads = []
+        self.open()
+        atexit.register(self.close)
+
+    def open(self):
+        self.fd = os.open(self.file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644)
+        self.file_bytes = 0
+        self.open_time = time.monotonic()
+        self.flush_time = self.open_time
+        if self.header: self.write(self.header)
+
+    def write(self, text):
+        data = text.encode("utf-8") if isinstance(text, str) else text
+        self.buffer.append(data)
+        self.buffer_bytes += len(data)
+        if self.buffer_bytes >= self.flush_bytes or time.monotonic() - self.flush_time >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self.fd < 0: return
+        self.flush_time = time.monotonic()
+        if self.buffer:
+            data = b"".join(self.buffer)
+            self.buffer = []
+            self.buffer_bytes = 0
+            self.file_bytes += len(data)
+            data_view = memoryview(data)
+            while data_view:
+                data_view = data_view[os.write(self.fd, data_view):]
+        if ((self.rotate_bytes and self.file_bytes >= self.rotate_bytes) or
+                (self.rotate_seconds and self.flush_time - self.open_time >= self.rotate_seconds)):
+            self.rotate()
+
+    def rotate(self):
+        os.close(self.fd)
+        self.fd = -1
+        self.segment += 1
+        base, ext = os.path.splitext(self.file_path)
+        segment_path = "%s.%d%s" % (base, self.segment, ext)
+        os.replace(self.file_path, segment_path)
+        if self.compress_open is not None:
+            # Not a daemon thread, so segments are completed before exit
+            compress_thread = threading.Thread(target=self.compress_segment, args=[segment_path])
+            compress_thread.start()
+            self.compress_threads = [t for t in self.compress_threads if t.is_alive()] + [compress_thread]
+        self.open()
+
+    def compress_segment(self, segment_path):
+        try:
+            with open(segment_path, "rb") as segment_file:
+                with self.compress_open(segment_path + self.compress_suffix + ".tmp", "wb") as compress_file:
+                    shutil.copyfileobj(segment_file, compress_file, 1<<20)
+            os.replace(segment_path + self.compress_suffix + ".tmp", segment_path + self.compress_suffix)
+            os.remove(segment_path)
+        except OSError as err:
+            print("Error: can not compress log segment [%s]: %s" % (segment_path, err), file=sys.stderr)
+
+    def close(self):
+        self.flush()
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        for compress_thread in self.compress_threads:
+            compress_thread.join()
+
+
+class COLUMN_LOG_WRITER(LOG_WRITER):
+    """Write frames of GPU samples as chunks of typed columns, buffered and rotated as by LOG_WRITER.
+
+       cards is the GPU inventory, a list of dicts which each have a card_num.  Frames are
+       collected into columns and written as a chunk when chunk_rows frames are collected or
+       when the log is flushed.  In a deadband log, where values within the deadband repeat the
+       last value logged, columns of a chunk which hold a single value are written as that value.
+    """
+    def __init__(self, file_path, numeric_fields, string_fields, cards, time_base_ns, chunk_rows=1024, deadband=None,
+                 **kwargs):
+        self.numeric_fields = tuple(numeric_fields)
+        self.string_fields = tuple(string_fields)
+        self.cards = list(cards)
+        self.time_base_ns = time_base_ns
+        self.chunk_rows = chunk_rows
+        self.times = array.array('q')
+        self.columns = [array.array('d') for _ in range(len(self.cards)*len(self.numeric_fields))]
+        self.codes = [array.array('i') for _ in range(len(self.cards)*len(self.string_fields))]
+        self.strings = {}
+        self.deadband = deadband
+        header = json.dumps({"numeric_fields": self.numeric_fields, "string_fields": self.string_fields,
+                             "cards": self.cards, "time_base_ns": time_base_ns, "deadband": deadband}).encode("utf-8")
+        header = pad8(COLUMN_LOG_MAGIC + COLUMN_LOG_HEADER_LEN.pack(len(header)) + header)
+        LOG_WRITER.__init__(self, file_path, header, **kwargs)
+
+    def write_frame(self, epoch_ns, records):
+        """Add a frame, where records holds (numeric values, string values) of each card in inventory order."""
+        self.times.append(epoch_ns - self.time_base_ns)
+        num_numeric = len(self.numeric_fields)
+        num_string = len(self.string_fields)
+        for i, (numeric_values, string_values) in enumerate(records):
+            for column, value in zip(self.columns[i*num_numeric:(i+1)*num_numeric], numeric_values):
+                column.append(value)
+            for column, value in zip(self.codes[i*num_string:(i+1)*num_string], string_values):
+                value = str(value)
+                code = self.strings.get(value)
+                if code is None:
+                    code = self.strings[value] = len(self.strings)
+                column.append(code)
+        if len(self.times) >= self.chunk_rows or time.monotonic() - self.flush_time >= self.flush_seconds:
+            self.flush()
+
+    def chunk_bytes(self):
+        """Return the collected frames as a chunk and start a new chunk."""
+        num_rows = len(self.times)
+        first_ns = self.times[0] + self.time_base_ns
+        last_ns = self.times[-1] + self.time_base_ns
+        columns = self.columns
+        codes = self.codes
+        if self.deadband is not None:
+            # Columns holding one value for the whole chunk are written as that value
+            constant = bytes(column.count(column[0]) == num_rows for column in columns + codes)
+            columns = [column[:1] if is_constant else column for column, is_constant in zip(columns, constant)]
+            codes = [column[:1] if is_constant else column for column, is_constant in zip(codes, constant[len(columns):])]
+        if BIG_ENDIAN:
+            for column in [self.times] + columns + codes: column.byteswap()
+        string_table = pad8(json.dumps(list(self.strings)).encode("utf-8"))
+        payload = [self.times.tobytes()]
+        if self.deadband is not None: payload.append(pad8(constant))
+        payload = b"".join(payload + [column.tobytes() for column in columns] +
+                           [pad8(b"".join(column.tobytes() for column in codes)), string_table])
+        self.times = array.array('q')
+        self.columns = [array.array('d') for _ in self.columns]
+        self.codes = [array.array('i') for _ in self.codes]
+        self.strings = {}
+        return(COLUMN_CHUNK_HEADER.pack(COLUMN_CHUNK_MAGIC, num_rows, len(payload), len(string_table),
+                                        first_ns, last_ns) + payload)
+
+    def flush(self):
+        if self.times:
+            self.buffer.append(self.chunk_bytes())
+        LOG_WRITER.flush(self)
+
+
+class COLUMN_CHUNK:
+    """A chunk of a column log, with columns as read only NumPy views of the log data."""
+    def __init__(self, reader, data, offset):
+        np = reader.np
+        (_, self.num_rows, payload_len, table_len, self.first_ns,
+         self.last_ns) = COLUMN_CHUNK_HEADER.unpack_from(data, offset)
+        offset += COLUMN_CHUNK_HEADER.size
+        self.end_offset = offset + payload_len
+        num_rows = self.num_rows
+        # ns since the time base of the log
+        self.times = np.frombuffer(data, dtype='<i8', count=num_rows, offset=offset)
+        offset += 8*num_rows
+        num_values = len(reader.cards) * len(reader.numeric_fields)
+        num_codes = len(reader.cards) * len(reader.string_fields)
+        if reader.deadband is None:
+            self.values = np.frombuffer(data, dtype='<f8', count=num_values*num_rows, offset=offset).reshape(
+                    num_values, num_rows)
+            offset += 8*num_values*num_rows
+            self.codes = np.frombuffer(data, dtype='<i4', count=num_codes*num_rows, offset=offset).reshape(
+                    num_codes, num_rows)
+        else:
+            # Constant columns hold one value, expanded to all rows as a broadcast view
+            constant = bytes(data[offset:offset + num_values + num_codes])
+            offset += num_values + num_codes + (-(num_values + num_codes) % 8)
+            self.values = []
+            for is_constant in constant[:num_values]:
+                count = 1 if is_constant else num_rows
+                self.values.append(np.broadcast_to(np.frombuffer(data, dtype='<f8', count=count, offset=offset),
+                                                   (num_rows,)))
+                offset += 8*count
+            self.codes = []
+            for is_constant in constant[num_values:]:
+                count = 1 if is_constant else num_rows
+                self.codes.append(np.broadcast_to(np.frombuffer(data, dtype='<i4', count=count, offset=offset),
+                                                  (num_rows,)))
+                offset += 4*count
+        table_offset = self.end_offset - table_len
+        self.strings = json.loads(bytes(data[table_offset:self.end_offset]).rstrip(b"\0").decode("utf-8"))
+
+
+class COLUMN_LOG_READER:
+    """Read a column log as NumPy arrays without parsing.
+
+       The log is memory mapped, or decompressed into memory if it is a compressed segment.
+       Columns of a single chunk are views of the log data.  NumPy is only imported by the reader.
+    """
+    def __init__(self, file_path):
+        import numpy as np
+        self.np = np
+        self.file_path = file_path
+        self.chunks = []
+        # Number of times the log was rotated and reopened while it was followed
+        self.rotations = 0
+        self.log_file, self.data = open_log_file(file_path)
+        if self.data[:len(COLUMN_LOG_MAGIC)] != COLUMN_LOG_MAGIC:
+            if self.log_file: self.log_file.close()
+            raise ValueError("Not a column log file: %s" % file_path)
+        offset = len(COLUMN_LOG_MAGIC)
+        (header_len,) = COLUMN_LOG_HEADER_LEN.unpack_from(self.data, offset)
+        offset += COLUMN_LOG_HEADER_LEN.size
+        header = json.loads(bytes(self.data[offset:offset + header_len]).decode("utf-8"))
+        self.numeric_fields = tuple(header["numeric_fields"])
+        self.string_fields = tuple(header["string_fields"])
+        self.cards = header["cards"]
+        self.time_base_ns = header["time_base_ns"]
+        self.deadband = header.get("deadband")
+        self.card_index = {str(card["card_num"]): i for i, card in enumerate(self.cards)}
+        self.numeric_index = {name: i for i, name in enumerate(self.numeric_fields)}
+        self.string_index = {name: i for i, name in enumerate(self.string_fields)}
+        self.end_offset = offset + header_len + (-(offset + header_len) % 8)
+        # First row and last time of each chunk, the sparse index used to find rows by time
+        self.chunk_starts = []
+        self.chunk_last_ns = []
+        self.read_chunks()
+
+    def read_chunks(self):
+        """Index complete chunks after the last one read, return the number of new chunks."""
+        num_chunks = len(self.chunks)
+        while self.end_offset + COLUMN_CHUNK_HEADER.size <= len(self.data):
+            magic, _, payload_len, _, _, _ = COLUMN_CHUNK_HEADER.unpack_from(self.data, self.end_offset)
+            if magic != COLUMN_CHUNK_MAGIC: break
+            if self.end_offset + COLUMN_CHUNK_HEADER.size + payload_len > len(self.data): break
+            chunk = COLUMN_CHUNK(self, self.data, self.end_offset)
+            self.chunk_starts.append(self.end_position())
+            self.chunk_last_ns.append(chunk.last_ns)
+            self.chunks.append(chunk)
+            self.end_offset = chunk.end_offset
+        return(len(self.chunks) - num_chunks)
+
+    def refresh(self):
+        """Read chunks added since the log was opened, as when following a log being written.
+
+           Once the log has been read to its end and was rotated, the new log is opened and
+           rotations is incremented, so positions start from the new log.
+        """
+        if self.log_file is None: return(0)
+        self.data = map_log_file(self.log_file, self.data)
+        num_chunks = self.read_chunks()
+        if num_chunks or not log_file_rotated(self.file_path, self.log_file, self.data): return(num_chunks)
+        try:
+            log_reader = COLUMN_LOG_READER(self.file_path)
+        except (OSError, ValueError):
+            # The new log has no header yet
+            return(0)
+        return(self.reopen(log_reader))
+
+    def reopen(self, log_reader):
+        """Take the state of log_reader, a reader of the new log, return its number of chunks."""
+        rotations = self.rotations
+        self.log_file.close()
+        self.__dict__.update(log_reader.__dict__)
+        self.rotations = rotations + 1
+        return(len(self.chunks))
+
+    def start_position(self):
+        return(0)
+
+    def end_position(self):
+        """Return the row after the last complete row, rows are numbered from 0 across chunks."""
+        return(self.chunk_starts[-1] + self.chunks[-1].num_rows if self.chunks else 0)
+
+    def time_range(self):
+        """Return (first, last) sample time in ns since the epoch, or None if the log is empty."""
+        if not self.chunks: return(None)
+        return((self.chunks[0].first_ns, self.chunks[-1].last_ns))
+
+    def find_position(self, epoch_ns):
+        """Return the first row at or after epoch_ns, using chunk times as the index."""
+        i = bisect.bisect_left(self.chunk_last_ns, epoch_ns)
+        if i == len(self.chunks): return(self.end_position())
+        chunk = self.chunks[i]
+        return(self.chunk_starts[i] + int(self.np.searchsorted(chunk.times, epoch_ns - self.time_base_ns)))
+
+    def rewind_position(self, position, num_frames):
+        """Return the row num_frames before position, each row being a frame of all cards."""
+        return(max(0, position - num_frames))
+
+    def select_rows(self, start, stop, step=1):
+        """Return (chunk, first row, end row) of each chunk holding rows start to stop, the first row
+           being the first of every step rows from start in the chunk.
+        """
+        if stop is None: stop = self.end_position()
+        parts = []
+        i = max(0, bisect.bisect_right(self.chunk_starts, start) - 1)
+        while i < len(self.chunks) and self.chunk_starts[i] < stop:
+            chunk_start = self.chunk_starts[i]
+            first = max(start - chunk_start, 0)
+            first += -(chunk_start + first - start) % step
+            parts.append((self.chunks[i], first, min(stop - chunk_start, self.chunks[i].num_rows)))
+            i += 1
+        return(parts)
+
+    def concat(self, arrays):
+        return(arrays[0] if len(arrays) == 1 else self.np.concatenate(arrays))
+
+    def get_times(self, start=0, stop=None, step=1):
+        """Return sample times of every step rows from start to stop as a datetime64[ns] array."""
+        parts = self.select_rows(start, stop, step)
+        if not parts: return(self.np.array([], dtype='datetime64[ns]'))
+        return((self.concat([chunk.times[lo:hi:step] for chunk, lo, hi in parts]) +
+                self.time_base_ns).view('datetime64[ns]'))
+
+    def get_column(self, card_num, name, start=0, stop=None, step=1):
+        """Return the values of a field of a card for every step rows from start to stop.
+
+           Numeric fields are float64 arrays, views of the log data if the rows are in one chunk,
+           and string fields are object arrays.
+        """
+        parts = self.select_rows(start, stop, step)
+        card_index = self.card_index[str(card_num)]
+        if name in self.numeric_index:
+            if not parts: return(self.np.array([], dtype=float))
+            column = card_index*len(self.numeric_fields) + self.numeric_index[name]
+            return(self.concat([chunk.values[column][lo:hi:step] for chunk, lo, hi in parts]))
+        column = card_index*len(self.string_fields) + self.string_index[name]
+        if not parts: return(self.np.array([], dtype=object))
+        return(self.concat([self.np.array(chunk.strings, dtype=object)[chunk.codes[column][lo:hi:step]]
+                            for chunk, lo, hi in parts]))
+
+
+class LOG_LINE_EXPANDER:
+    """Expand lines of a deadband text log to full lines, replacing LOG_UNCHANGED with the last value
+       logged for the card.  card_values holds the last values of each card, which may be set to
+       expand lines from the middle of a log.
+    """
+    def __init__(self):
+        self.card_values = {}
+
+    def expand(self, text):
+        """Expand complete lines of text."""
+        card_values = self.card_values
+        lines = []
+        for line in text.splitlines():
+            items = line.split("|")
+            if len(items) < 2: continue
+            if LOG_UNCHANGED in items:
+                last_items = card_values.get(items[1], ())
+                items = [(last_items[i] if i < len(last_items) else "") if item == LOG_UNCHANGED else item
+                         for i, item in enumerate(items)]
+            card_values[items[1]] = items
+            lines.append("|".join(items))
+        lines.append("")
+        return("\n".join(lines))
+
+
+class TEXT_LOG_READER:
+    """Read a psv log written by LOG_WRITER by byte offset, with a sparse index of times to offsets.
+
+       The log is memory mapped, or decompressed into memory if it is a compressed segment.
+       The index holds the time and offset of the first line after every index_step bytes, so
+       only one line per step is parsed to build it, and finding the offset of a time parses
+       at most one step of lines.  Times are in seconds, so frames written less than a second
+       apart share a time.  A frame is the lines of a time up to the next line of a card it
+       already has a line of, since each frame has one line per card.
+       If index_file is given, the index is kept there, so it is only built on the first open.
+    """
+    def __init__(self, file_path, index_step=1<<18, index_file=None):
+        self.file_path = file_path
+        self.index_step = index_step
+        self.index_file = index_file
+        self.index_offsets = []
+        self.index_times = []
+        # Number of times the log was rotated and reopened while it was followed
+        self.rotations = 0
+        self.log_file, self.data = open_log_file(file_path)
+        self.header_end = self.data.find(b"\n") + 1
+        if self.data[:5] != b"Time|" or self.header_end == 0:
+            if self.log_file: self.log_file.close()
+            raise ValueError("Not a monitor log file: %s" % file_path)
+        self.header_item = [h.strip() for h in bytes(self.data[:self.header_end]).decode("utf-8").split("|")]
+        self.deadband = self.header_item[-1] == LOG_UNCHANGED
+        if self.deadband: self.header_item.pop()
+        self.end_offset = self.header_end
+        self.time_cache = (None, None)
+        self.index_key = None
+        if index_file and self.log_file is not None:
+            file_stat = os.stat(file_path)
+            self.index_key = "%s:%d:%d:%d" % (os.path.realpath(file_path), file_stat.st_dev, file_stat.st_ino,
+                                              index_step)
+            self.load_index()
+        num_indexed = len(self.index_offsets)
+        self.read_lines()
+        if self.index_key and len(self.index_offsets) > num_indexed: self.save_index()
+
+    def load_index(self):
+        """Load the index of the log from the index file, if it is still valid for the log."""
+        try:
+            with open(self.index_file) as index_file:
+                index = json.load(index_file)[self.index_key]
+            offsets, times = index["offsets"], index["times"]
+            # The log is only appended to, so the index is valid if the log is no shorter and the
+            # first and last entries are unchanged.  A new log may reuse the inode of a rotated one.
+            if (offsets and index["size"] <= len(self.data) and offsets[-1] < len(self.data) and
+                    self.line_time(offsets[0]) == times[0] and self.line_time(offsets[-1]) == times[-1]):
+                self.index_offsets, self.index_times = offsets, times
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def save_index(self):
+        """Save the index of the log to the index file, which holds the indexes of the most recent logs."""
+        try:
+            with open(self.index_file) as index_file:
+                indexes = json.load(index_file)
+            if not isinstance(indexes, dict): indexes = {}
+        except (OSError, ValueError):
+            indexes = {}
+        indexes.pop(self.index_key, None)
+        indexes = dict(list(indexes.items())[-(LOG_INDEX_ENTRIES - 1):])
+        indexes[self.index_key] = {"offsets": self.index_offsets, "times": self.index_times, "size": self.end_offset}
+        try:
+            env.write_atomic(self.index_file, json.dumps(indexes))
+        except OSError as err:
+            print("Error: can not write log index [%s]: %s" % (self.index_file, err), file=sys.stderr)
+
+    def read_lines(self):
+        """Index complete lines after the last one read, return the number of bytes added."""
+        end_offset = self.data.rfind(b"\n") + 1
+        if end_offset <= self.end_offset: return(0)
+        num_bytes = end_offset - self.end_offset
+        self.end_offset = end_offset
+        offset = self.index_offsets[-1] + self.index_step if self.index_offsets else self.header_end
+        while offset < end_offset:
+            # Start of the first line at or after offset
+            offset = self.data.find(b"\n", offset - 1, end_offset) + 1
+            if offset <= 0 or offset >= end_offset: break
+            try:
+                line_time = self.line_time(offset)
+            except ValueError:
+                offset = self.next_line(offset)
+                continue
+            self.index_offsets.append(offset)
+            self.index_times.append(line_time)
+            offset += self.index_step
+        return(num_bytes)
+
+    def refresh(self):
+        """Read lines added since the log was opened, as when following a log being written.
+
+           Once the log has been read to its end and was rotated, the new log is opened and
+           rotations is incremented, so positions start from the new log.
+        """
+        if self.log_file is None: return(0)
+        self.data = map_log_file(self.log_file, self.data)
+        num_bytes = self.read_lines()
+        if num_bytes or not log_file_rotated(self.file_path, self.log_file, self.data): return(num_bytes)
+        try:
+            log_reader = TEXT_LOG_READER(self.file_path, self.index_step, self.index_file)
+        except (OSError, ValueError):
+            # The new log has no header yet
+            return(0)
+        return(self.reopen(log_reader))
+
+    def reopen(self, log_reader):
+        """Take the state of log_reader, a reader of the new log, return its number of bytes."""
+        rotations = self.rotations
+        self.log_file.close()
+        self.__dict__.update(log_reader.__dict__)
+        self.rotations = rotations + 1
+        return(self.end_offset - self.header_end)
+
+    def start_position(self):
+        return(self.header_end)
+
+    def next_line(self, offset):
+        return(self.data.find(b"\n", offset, self.end_offset) + 1 or self.end_offset)
+
+    def line_time(self, offset):
+        """Return the time of the line at offset in ns since the epoch."""
+        time_end = self.data.find(b"|", offset, offset + 64)
+        if time_end < 0: raise ValueError("No time in log line at offset %d" % offset)
+        time_bytes = bytes(self.data[offset:time_end])
+        # Consecutive lines are mostly of the same frame, so the last time is reused
+        if time_bytes != self.time_cache[0]:
+            time_n = datetime.strptime(time_bytes.decode("utf-8").strip(), '%a %b %d %H:%M:%S %Y')
+            self.time_cache = (time_bytes, datetime_to_epoch_ns(time_n))
+        return(self.time_cache[1])
+
+    def end_position(self):
+        """Return the offset after the last complete line."""
+        return(self.end_offset)
+
+    def time_range(self):
+        """Return (first, last) line time in ns since the epoch, or None if the log is empty."""
+        if self.end_offset <= self.header_end: return(None)
+        last_line = self.data.rfind(b"\n", 0, self.end_offset - 1) + 1
+        return((self.line_time(self.header_end), self.line_time(last_line)))
+
+    def find_position(self, epoch_ns):
+        """Return the offset of the first line at or after epoch_ns."""
+        i = bisect.bisect_left(self.index_times, epoch_ns)
+        offset = self.index_offsets[i - 1] if i > 0 else self.header_end
+        while offset < self.end_offset:
+            try:
+                if self.line_time(offset) >= epoch_ns: break
+            except ValueError:
+                pass
+            offset = self.next_line(offset)
+        return(offset)
+
+    def line_frame_key(self, line_start, line_end):
+        """Return (time, card number) bytes of the line from line_start to line_end."""
+        time_end = self.data.find(b"|", line_start, line_end)
+        if time_end < 0: return((bytes(self.data[line_start:line_end]), b""))
+        card_end = self.data.find(b"|", time_end + 1, line_end)
+        if card_end < 0: card_end = line_end
+        return((bytes(self.data[line_start:time_end]), bytes(self.data[time_end + 1:card_end])))
+
+    def rewind_position(self, position, num_frames):
+        """Return the offset of the line num_frames frames before position."""
+        offset = position
+        frame_time = None
+        frame_cards = set()
+        while offset > self.header_end:
+            line_start = self.data.rfind(b"\n", self.header_end - 1, offset - 1) + 1
+            line_time, card = self.line_frame_key(line_start, offset)
+            if line_time != frame_time or card in frame_cards:
+                if num_frames == 0: break
+                num_frames -= 1
+                frame_time = line_time
+                frame_cards = set()
+            frame_cards.add(card)
+            offset = line_start
+        return(offset)
+
+    def frame_end(self, offset, stop):
+        """Return the offset after the rest of the frame of the line at offset, at most stop."""
+        frame_time = None
+        frame_cards = set()
+        while offset < stop:
+            line_end = self.next_line(offset)
+            line_time, card = self.line_frame_key(offset, line_end)
+            if (frame_time is not None and line_time != frame_time) or card in frame_cards: break
+            frame_time = line_time
+            frame_cards.add(card)
+            offset = line_end
+        return(min(offset, stop))
+
+    def get_sample_text(self, start, stop, step):
+        """Return the lines of the first whole frame after every step bytes from offset start to stop,
+           as text expanded to full lines if a deadband log.
+        """
+        texts = []
+        for offset in range(start, stop, step):
+            line_start = self.data.find(b"\n", offset - 1, stop) + 1
+            if line_start <= 0: break
+            frame_start = self.frame_end(line_start, stop)
+            frame_stop = self.frame_end(frame_start, stop)
+            if frame_stop <= frame_start: break
+            text = bytes(self.data[frame_start:frame_stop]).decode("utf-8", errors="replace")
+            if self.deadband:
+                expander = LOG_LINE_EXPANDER()
+                expander.card_values = self.read_card_values(frame_start)
+                text = expander.expand(text)
+            texts.append(text)
+        return("".join(texts))
+
+    def get_text(self, start, stop=None):
+        """Return the lines from offset start to stop as text, expanded to full lines if a deadband log."""
+        if stop is None: stop = self.end_offset
+        text = bytes(self.data[start:stop]).decode("utf-8", errors="replace")
+        if not self.deadband: return(text)
+        expander = LOG_LINE_EXPANDER()
+        expander.card_values = self.read_card_values(start)
+        return(expander.expand(text))
+
+    def read_card_values(self, position):
+        """Return the last logged values of each card before position, by reading back to the last
+           line of each card without LOG_UNCHANGED values, which is at most one keyframe back.
+        """
+        card_values = {}
+        frame_time = None
+        frame_cards = set()
+        in_frame = True
+        offset = position
+        while offset > self.header_end:
+            line_start = self.data.rfind(b"\n", self.header_end - 1, offset - 1) + 1
+            items = bytes(self.data[line_start:offset - 1]).decode("utf-8", errors="replace").split("|")
+            offset = line_start
+            if len(items) < 2: continue
+            # Done when a whole frame, so every card, has been read and all values are known
+            if in_frame:
+                if frame_time is None:
+                    frame_time = items[0]
+                elif items[0] != frame_time or items[1] in frame_cards:
+                    in_frame = False
+                frame_cards.add(items[1])
+            if not in_frame and not any(LOG_UNCHANGED in values for values in card_values.values()):
+                break
+            values = card_values.get(items[1])
+            if values is None:
+                card_values[items[1]] = items
+            elif LOG_UNCHANGED in values:
+                card_values[items[1]] = [item if value == LOG_UNCHANGED else value for value, item in zip(values, items)]
+        return(card_values)
+
+
+def open_log_reader(file_path, index_file=None):
+    """Return a COLUMN_LOG_READER or TEXT_LOG_READER of a log file, by the log format."""
+    try:
+        return(COLUMN_LOG_READER(file_path))
+    except ValueError:
+        return(TEXT_LOG_READER(file_path, index_file=index_file))
@@ -26,7 +26,7 @@ __maintainer__ = "RueiKe"
 __status__ = "Stable Release"
 
 import re
-import socket
+import json
 import os
 import platform
 import sys
@@ -36,19 +36,30 @@ from pathlib import Path
 from uuid import uuid4
 import glob 
 import shutil 
-import urllib.request
+try:
+    from GPUmodules import env
+except:
+    import env
 
 
 class PCI_ID:
+    """Decode PCI device ids with an extract of the PCI ID Repository file.
+
+       The file is parsed into a nested index of vendor -> device -> subsystem once per process,
+       and the index is cached on disk, keyed by the file's mtime, size and version.
+    """
+    # Index by PCI ID file name, shared by all PCI_ID objects in the process
+    index_cache = {}
+    # Incremented when the index or cache format changes
+    cache_format = 1
+
     def __init__(self, file_name="amd_pci_id.txt"):
         self.pciid_url = "https://pci-ids.ucw.cz/v2.2/pci.ids"
         self.pciid_file = "pci.ids"
         self.amdgpu_utils_file = os.path.join(os.path.dirname(str(Path(__file__).resolve())), file_name)
-        try:
-            #self.pci_id_file_ptr = open(os.path.join(os.path.dirname(str(Path(__file__).resolve())), file_name), 'r')
-            self.pci_id_file_ptr = open(self.amdgpu_utils_file, 'r')
-        except:
-            print("Can not open [%s] to read. Exiting..." % os.path.join(os.path.dirname(str(Path(__file__).resolve())), file_name))
+        if not os.path.isfile(self.amdgpu_utils_file):
+            print("Can not open [%s] to read. Exiting..." % self.amdgpu_utils_file)
+        self.cache_file = os.path.join(env.gut_const.cache_dir, "pci_id_index.json")
 
 
     def get_pciid_version(self, filename=""):
@@ -60,26 +71,25 @@ class PCI_ID:
             return version details as a string
         """
         if filename == "":
-            get_file_ptr = self.pci_id_file_ptr
-        else:
-            get_file_ptr = open(filename, 'r')
+            filename = self.amdgpu_utils_file
 
         file_version = "Unknown"
         file_date = "Unknown"
-        for line in get_file_ptr:
-            if line[0] != '#':
-                break
-            searchObj = re.search('Version:', line.strip())
-            if(searchObj != None):
-                lineItem = line.split(':', 1)
-                if len(lineItem) > 1:
-                    file_version = lineItem[1].strip()
-            searchObj = re.search('Date:', line.strip())
-            if(searchObj != None):
-                lineItem = line.split(':', 1)
-                if len(lineItem) > 1:
-                    file_date = lineItem[1].strip()
-                break
+        with open(filename, 'r') as get_file_ptr:
+            for line in get_file_ptr:
+                if line[0] != '#':
+                    break
+                searchObj = re.search('Version:', line.strip())
+                if(searchObj != None):
+                    lineItem = line.split(':', 1)
+                    if len(lineItem) > 1:
+                        file_version = lineItem[1].strip()
+                searchObj = re.search('Date:', line.strip())
+                if(searchObj != None):
+                    lineItem = line.split(':', 1)
+                    if len(lineItem) > 1:
+                        file_date = lineItem[1].strip()
+                    break
         return("Version: "+ file_version + ", Date: " + file_date)
 
     def download_pciid(self):
@@ -88,6 +98,8 @@ class PCI_ID:
             return the new downloaded data's filename as a string
         """
         file_name = self.pciid_file + datetime.utcnow().strftime('%m%d_%H%M%S') + ".txt"
+        # Only needed for download, so not imported with the module
+        import urllib.request
         #response = urllib.request.urlretrieve(self.pciid_url, self.pciid_file)
         with urllib.request.urlopen(self.pciid_url) as response, open(file_name, 'wb') as out_file:
             shutil.copyfileobj(response, out_file)
@@ -95,9 +107,13 @@ class PCI_ID:
         return(file_name)
 
     def update_pci_id(self, in_file_name):
-        self.pci_id_file_ptr.close()
         self.extract_vendor_from_pci_id("0x1002", in_file_name, self.amdgpu_utils_file)
-        #self.pci_id_file_ptr = open(os.path.join(os.path.dirname(str(Path(__file__).resolve())), file_name), 'r')
+        # Replace the index of the old file in memory and on disk
+        PCI_ID.index_cache.pop(self.amdgpu_utils_file, None)
+        self.write_index_cache(self.get_index_key(), self.build_index())
+        # Model names in the GPU inventory cache may have changed
+        if os.path.isfile(env.gut_const.inventory_file):
+            os.remove(env.gut_const.inventory_file)
         return(0)
 
     def extract_vendor_from_pci_id(self, vendor, in_file_name, out_file_name=""):
@@ -113,8 +129,9 @@ class PCI_ID:
             file_ptr=sys.stdout
         else:
             shutil.copy2(out_file_name, out_file_name + datetime.utcnow().strftime('%m%d_%H%M%S'))
+            # Write to a temporary file which replaces the output file when complete
             try:
-                file_ptr = open(out_file_name, 'w')
+                file_ptr = open(out_file_name + ".tmp", 'w')
             except:
                 print("Can not open [%s] to write. Exiting..." % out_file_name)
                 sys.exit(-1)
@@ -143,46 +160,102 @@ class PCI_ID:
                 print(line, file=file_ptr)
                 continue
         in_file_ptr.close()
+        if out_file_name != "":
+            file_ptr.close()
+            os.replace(out_file_name + ".tmp", out_file_name)
         return
 
+    def build_index(self):
+        """ Parse the PCI ID file into a nested dict of the format:
+            {vendor: {device: {"name":"", "subsystems": {"subsystem_vendor subsystem_device":""}}}}
+            with ids as lower case hex strings without 0x.
+        """
+        index = {}
+        devices = None
+        device = None
+        with open(self.amdgpu_utils_file, 'r') as pci_id_file_ptr:
+            for line_item in pci_id_file_ptr:
+                line = line_item.rstrip()
+                if len(line)<4: continue
+                if line[0] == '#': continue
+                if line[0] != '\t':
+                    # Vendor line, or a class list which ends the device list
+                    devices = index.setdefault(line[:4].lower(), {}) if line[:1] != 'C' else None
+                    device = None
+                elif devices is None:
+                    continue
+                elif line[1] != '\t':
+                    device_id = line[1:5].lower()
+                    if device_id in devices:
+                        # Only the first entry for a device is used
+                        device = None
+                        continue
+                    device = devices[device_id] = {"name": line[5:].strip(), "subsystems": {}}
+                elif device is not None:
+                    device["subsystems"].setdefault(line[2:11].lower(), line[11:].strip())
+        return(index)
+
+    def get_index_key(self):
+        """ Return a key which identifies the current contents of the PCI ID file."""
+        file_stat = os.stat(self.amdgpu_utils_file)
+        return({"file": self.amdgpu_utils_file, "mtime_ns": file_stat.st_mtime_ns, "size": file_stat.st_size,
+                "version": self.get_pciid_version(), "format": self.cache_format})
+
+    def read_index_cache(self, index_key):
+        """ Return the cached index if its key matches, or None."""
+        try:
+            with open(self.cache_file, 'r') as cache_file_ptr:
+                cache = json.load(cache_file_ptr)
+        except (OSError, ValueError):
+            return(None)
+        if cache.get("key") != index_key: return(None)
+        return(cache.get("index"))
+
+    def write_index_cache(self, index_key, index):
+        """ Atomically write the index and its key to the cache file."""
+        PCI_ID.index_cache[self.amdgpu_utils_file] = index
+        try:
+            env.write_atomic(self.cache_file, json.dumps({"key": index_key, "index": index}))
+        except OSError as err:
+            if env.gut_const.DEBUG: print("Warning: can not write PCI ID cache [%s]: %s" % (self.cache_file, err))
+
+    def get_index(self):
+        """ Return the index of the PCI ID file, from memory, the on disk cache, or by parsing the file."""
+        index = PCI_ID.index_cache.get(self.amdgpu_utils_file)
+        if index is not None: return(index)
+        try:
+            index_key = self.get_index_key()
+        except OSError:
+            PCI_ID.index_cache[self.amdgpu_utils_file] = {}
+            return({})
+        index = self.read_index_cache(index_key)
+        if index is None:
+            index = self.build_index()
+            self.write_index_cache(index_key, index)
+        PCI_ID.index_cache[self.amdgpu_utils_file] = index
+        return(index)
+
+    def get_names(self, dev_id):
+        """ For a device id dict of the format:
+            {"vendor":"","device":"","subsystem_vendor":"","subsystem_device":""}
+            return the device name and subsystem name from the indexed PCI ID file extract,
+            with an empty string for names not found.
+        """
+        device = self.get_index().get(dev_id["vendor"].replace('0x','').lower(), {}).get(
+                    dev_id["device"].replace('0x','').lower())
+        if device is None: return("", "")
+        subsystem = (dev_id["subsystem_vendor"].replace('0x','') + " " +
+                     dev_id["subsystem_device"].replace('0x','')).lower()
+        return(device["name"], device["subsystems"].get(subsystem, ""))
+
     def get_model(self, dev_id):
         """ For a device id dict of the format:
             {"vendor":"","device":"","subsystem_vendor":"","subsystem_device":""}
-            search a PCI ID file extract from the PCI ID Repository and return the
+            look up the indexed PCI ID file extract from the PCI ID Repository and return the
             resultant Model Name as a string.
         """
-
-        self.pci_id_file_ptr = open(self.amdgpu_utils_file, 'r')
-        model_str = ""
-        level = 0
-        for line_item in self.pci_id_file_ptr:
-            line = line_item.rstrip()
-            if len(line)<4: continue
-            if line[0] == '#': continue
-            if level == 0:
-                if re.fullmatch(r'^[0-9a-fA-F][0-9a-fA-F][0-9a-fA-F][0-9a-fA-F].*', line):
-                    if line[:4] == dev_id["vendor"].replace('0x',''):
-                        level += 1
-                        continue
-            elif level == 1:
-                if re.fullmatch(r'^[0-9a-fA-F][0-9a-fA-F][0-9a-fA-F][0-9a-fA-F].*', line):
-                    break
-                if re.fullmatch(r'^\t[0-9a-fA-F][0-9a-fA-F][0-9a-fA-F][0-9a-fA-F].*', line):
-                    if line[1:5] == dev_id["device"].replace('0x',''):
-                        model_str = line[5:]
-                        level += 1
-                        continue
-            elif level == 2:
-                if re.fullmatch(r'^[0-9a-fA-F][0-9a-fA-F][0-9a-fA-F][0-9a-fA-F].*', line):
-                    break
-                if re.fullmatch(r'^\t[0-9a-fA-F][0-9a-fA-F][0-9a-fA-F][0-9a-fA-F].*', line):
-                    break
-                if re.fullmatch(r'^\t\t[0-9a-fA-F][0-9a-fA-F][0-9a-fA-F][0-9a-fA-F].*', line):
-                    if line[2:6] == dev_id["subsystem_vendor"].replace('0x',''):
-                        if line[7:11] == dev_id["subsystem_device"].replace('0x',''):
-                            model_str = line[11:]
-                            break
-        return(model_str.strip())
+        device_name, subsystem_name = self.get_names(dev_id)
+        return(subsystem_name or device_name)
 
 
 def test():
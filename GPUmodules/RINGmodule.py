@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""RINGmodule  -  memory mapped ring file of GPU samples
+
+    A single sampler process (amdgpu-sampler) reads all GPUs and publishes each frame into
+    a ring file, which any number of readers map and read without touching sysfs.
+
+    The ring file format is described in docs/USER_GUIDE.md.
+
+    Copyright (C) 2019  RueiKe
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+__author__ = "RueiKe"
+__copyright__ = "Copyright (C) 2019 RueiKe"
+__credits__ = [""]
+__license__ = "GNU General Public License"
+__program_name__ = "amdgpu-utils"
+__version__ = "v2.5.0"
+__maintainer__ = "RueiKe"
+__status__ = "Stable Release"
+
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+
+RING_MAGIC = b"\x89AGURNG1"
+RING_HEADER = struct.Struct("<QIIIIIII")
+RING_META_LEN = struct.Struct("<I")
+RING_SLOT_HEADER = struct.Struct("<Qq")
+# Offset of the latest frame number in the file, 8 byte aligned so it is written atomically
+RING_LATEST_OFFSET = len(RING_MAGIC)
+RING_LATEST = struct.Struct("<Q")
+RING_STR_LEN = 32
+
+
+def align8(size):
+    return((size + 7) & ~7)
+
+
+class SAMPLE_RING_WRITER:
+    """Create a ring file and publish frames of GPU samples into it.
+
+       The file is built under a temporary name and renamed into place, so readers never see
+       a partial header.
+    """
+    def __init__(self, file_path, numeric_fields, string_fields, cards, num_slots=64):
+        self.file_path = file_path
+        self.numeric_fields = tuple(numeric_fields)
+        self.string_fields = tuple(string_fields)
+        self.cards = tuple(cards)
+        self.num_slots = num_slots
+        self.frame_num = 0
+        meta = json.dumps({"numeric_fields": self.numeric_fields, "string_fields": self.string_fields,
+                           "cards": self.cards, "pid": os.getpid(),
+                           "byteorder": sys.byteorder}).encode("utf-8")
+        self.header_size = align8(len(RING_MAGIC) + RING_HEADER.size + RING_META_LEN.size + len(meta))
+        self.num_values = len(self.cards) * len(self.numeric_fields)
+        self.str_offset = RING_SLOT_HEADER.size + 8*self.num_values
+        self.slot_size = align8(self.str_offset + len(self.cards) * len(self.string_fields) * RING_STR_LEN)
+        file_size = self.header_size + self.num_slots * self.slot_size
+
+        tmp_file = "%s.%d.tmp" % (file_path, os.getpid())
+        fd = os.open(tmp_file, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, file_size)
+            self.mm = mmap.mmap(fd, file_size)
+        finally:
+            os.close(fd)
+        header = RING_MAGIC + RING_HEADER.pack(0, self.header_size, self.slot_size, self.num_slots, len(self.cards),
+                    len(self.numeric_fields), len(self.string_fields), RING_STR_LEN) + \
+                 RING_META_LEN.pack(len(meta)) + meta
+        self.mm[:len(header)] = header
+        os.replace(tmp_file, file_path)
+        self.view = memoryview(self.mm)
+        self.values = [self.view[self.slot_offset(slot) + RING_SLOT_HEADER.size:
+                                 self.slot_offset(slot) + self.str_offset].cast("d")
+                       for slot in range(self.num_slots)]
+
+    def slot_offset(self, slot):
+        return(self.header_size + slot * self.slot_size)
+
+    def write_frame(self, epoch_ns, samples, strings):
+        """Publish a frame, where samples and strings hold the numeric and string values of each card."""
+        frame_num = self.frame_num + 1
+        slot = frame_num % self.num_slots
+        offset = self.slot_offset(slot)
+        RING_SLOT_HEADER.pack_into(self.mm, offset, 2*frame_num + 1, epoch_ns)
+        values = self.values[slot]
+        num_fields = len(self.numeric_fields)
+        for i, sample in enumerate(samples):
+            values[i*num_fields:(i+1)*num_fields] = sample
+        str_offset = offset + self.str_offset
+        for card_strings in strings:
+            for value in card_strings:
+                value_bytes = str(value).encode("utf-8")[:RING_STR_LEN]
+                self.mm[str_offset:str_offset + RING_STR_LEN] = value_bytes.ljust(RING_STR_LEN, b"\0")
+                str_offset += RING_STR_LEN
+        RING_SLOT_HEADER.pack_into(self.mm, offset, 2*frame_num + 2, epoch_ns)
+        RING_LATEST.pack_into(self.mm, RING_LATEST_OFFSET, frame_num)
+        self.frame_num = frame_num
+
+    def close(self):
+        self.values = []
+        self.view.release()
+        self.mm.close()
+
+
+class SAMPLE_RING_READER:
+    """Map a ring file read only and return copies of the latest frame."""
+    def __init__(self, file_path):
+        self.file_path = file_path
+        with open(file_path, "rb") as ring_file:
+            self.inode = os.fstat(ring_file.fileno()).st_ino
+            self.mm = mmap.mmap(ring_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(RING_MAGIC)] != RING_MAGIC:
+            raise ValueError("Not a sample ring file: %s" % file_path)
+        (_, self.header_size, self.slot_size, self.num_slots, num_cards, num_numeric, num_string,
+         self.str_len) = RING_HEADER.unpack_from(self.mm, len(RING_MAGIC))
+        meta_offset = len(RING_MAGIC) + RING_HEADER.size
+        (meta_len,) = RING_META_LEN.unpack_from(self.mm, meta_offset)
+        meta_offset += RING_META_LEN.size
+        meta = json.loads(self.mm[meta_offset:meta_offset + meta_len].decode("utf-8"))
+        if meta.get("byteorder") != sys.byteorder:
+            raise ValueError("Sample ring file not in %s endian byte order: %s" % (sys.byteorder, file_path))
+        self.numeric_fields = tuple(meta["numeric_fields"])
+        self.string_fields = tuple(meta["string_fields"])
+        self.cards = tuple(meta["cards"])
+        self.card_index = {card_num: i for i, card_num in enumerate(self.cards)}
+        self.pid = meta["pid"]
+        self.frame_num = 0
+        self.num_numeric = num_numeric
+        self.str_offset = RING_SLOT_HEADER.size + 8*num_cards*num_numeric
+        self.str_end = self.str_offset + num_cards*num_string*self.str_len
+
+    def latest_frame_num(self):
+        return(RING_LATEST.unpack_from(self.mm, RING_LATEST_OFFSET)[0])
+
+    def frame_valid(self, frame_num):
+        """Return True if the slot of frame_num still holds that complete frame."""
+        offset = self.header_size + (frame_num % self.num_slots) * self.slot_size
+        return(RING_SLOT_HEADER.unpack_from(self.mm, offset)[0] == 2*frame_num + 2)
+
+    def read_latest(self):
+        """Return (frame_num, epoch_ns, samples, strings) of the latest frame if it is newer than the
+           last one read, else None.  samples are arrays of the numeric values of each card and
+           strings are dicts of the string values of each card, copied from the ring.
+        """
+        for _ in range(3):
+            frame_num = self.latest_frame_num()
+            if frame_num == 0 or frame_num == self.frame_num: return(None)
+            offset = self.header_size + (frame_num % self.num_slots) * self.slot_size
+            seq, epoch_ns = RING_SLOT_HEADER.unpack_from(self.mm, offset)
+            if seq != 2*frame_num + 2: continue
+            slot_data = self.mm[offset:offset + self.str_end]
+            if not self.frame_valid(frame_num): continue
+            self.frame_num = frame_num
+            values = array('d')
+            values.frombytes(slot_data[RING_SLOT_HEADER.size:self.str_offset])
+            num_numeric = self.num_numeric
+            samples = [values[i*num_numeric:(i+1)*num_numeric] for i in range(len(self.cards))]
+            return((frame_num, epoch_ns, samples, self.read_strings(slot_data)))
+        return(None)
+
+    def read_strings(self, slot_data):
+        """Return the string values of each card in a copy of a slot as a list of dicts."""
+        offset = self.str_offset
+        card_strings = []
+        for _ in self.cards:
+            values = {}
+            for name in self.string_fields:
+                values[name] = slot_data[offset:offset + self.str_len].rstrip(b"\0").decode("utf-8", errors="replace")
+                offset += self.str_len
+            card_strings.append(values)
+        return(card_strings)
+
+    def replaced(self):
+        """Return True if a new ring file has been created in place of the mapped one."""
+        try:
+            return(os.stat(self.file_path).st_ino != self.inode)
+        except OSError:
+            return(False)
+
+    def writer_alive(self):
+        """Return True if the sampler process which created the ring is still running."""
+        try:
+            os.kill(self.pid, 0)
+        except ProcessLookupError:
+            return(False)
+        except PermissionError:
+            pass
+        return(True)
@@ -14,7 +14,5 @@
 #
 #    You should have received a copy of the GNU General Public License
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
-from GPUmodules import GPUmodule
-from GPUmodules import env
-from GPUmodules import PCImodule
+# Modules are imported by the utilities as needed, so importing the package doesn't load them all
 
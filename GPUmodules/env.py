@@ -27,20 +27,40 @@ __maintainer__ = "RueiKe"
 __status__ = "Stable Release"
 
 import re
-import subprocess
+import json
+import glob
 import os
 import platform
 import sys
 import time
-import shlex
-import shutil
 from datetime import datetime
 
 
+def write_atomic(file_path, data):
+    """ Write the str data to file_path through a temporary file which replaces it, so readers never
+        see a partial file.  The directory is created if needed.  Raises OSError on failure.
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_file = "%s.%d.tmp" % (file_path, os.getpid())
+    try:
+        with open(tmp_file, 'w') as tmp_file_ptr:
+            tmp_file_ptr.write(data)
+        os.replace(tmp_file, file_path)
+    except OSError:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+        raise
+
+
 class GUT_CONST:
     def __init__(self):
         self.featuremask = "/sys/module/amdgpu/parameters/ppfeaturemask"
         self.card_root = "/sys/class/drm/"
+        self.pci_root = "/sys/bus/pci/devices/"
+        self.amdgpu_module = "/sys/module/amdgpu/"
+        self.boot_id_file = "/proc/sys/kernel/random/boot_id"
         self.hwmon_sub = "hwmon/hwmon"
         self.execute_pac = False
         self.DEBUG = False
@@ -48,11 +68,25 @@ class GUT_CONST:
         self.SIMLOG = False
         self.LOG = False
         self.PLOT = False
+        self.PLOT_BINARY = False
+        self.LOG_BINARY = False
         self.log_file_ptr = ""
         self.show_fans = True
         self.write_delta_only = False
+        # Deadband of each logged field when only logging values that change, else None
+        self.log_deadband = None
+        self.log_keyframe = 60
         self.SLEEP = 2
+        self.SAMPLE = 2
+        self.workers = 0
         self.PATH = "."
+        self.cache_dir = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "amdgpu-utils")
+        self.env_cache_file = os.path.join(self.cache_dir, "env_check.json")
+        self.inventory_file = os.path.join(self.cache_dir, "inventory.json")
+        self.clinfo_cache_file = os.path.join(self.cache_dir, "clinfo.json")
+        self.log_index_file = os.path.join(self.cache_dir, "log_index.json")
+        self.opencl_vendors = "/etc/OpenCL/vendors/"
+        self.ring_file = os.path.join(os.environ.get("XDG_RUNTIME_DIR", "/dev/shm"), "amdgpu-utils-samples.ring")
         self.amdfeaturemask = ""
 
     def read_amdfeaturemask(self):
@@ -88,44 +122,82 @@ class GUT_CONST:
                     str(required_kversion[0]) +"."+ str(required_kversion[1]), file=sys.stderr)
             return(-2)
 
-        # Check AMD GPU Driver Version
-        lshw_out = subprocess.check_output(shlex.split('lshw -c video'), shell=False,
-                stderr=subprocess.DEVNULL).decode().split("\n")
-        for lshw_line in lshw_out:
-            searchObj = re.search('configuration:', lshw_line)
-            if(searchObj != None):
-                lineitems = lshw_line.split(sep=':')
-                driver_str = lineitems[1].strip()
-                searchObj = re.search('driver=amdgpu', driver_str)
-                if(searchObj != None):
-                    return(0)
-                else:
-                    print(f"amdgpu-utils non-compatible driver: {driver_str}")
-                    return(-3)
-        return(0)
+        # Check AMD GPU Driver, using results cached for this boot if available
+        env_cache = self.read_env_cache()
+        if "driver_check" not in env_cache:
+            env_cache["driver_check"], env_cache["driver"] = self.check_amd_driver()
+            self.write_env_cache(env_cache)
+        elif self.DEBUG: print("Using cached driver check for boot_id %s" % env_cache["boot_id"])
+        if env_cache["driver_check"] < 0:
+            print(f"amdgpu-utils non-compatible driver: driver={env_cache['driver']}")
+        return(env_cache["driver_check"])
 
-    def get_amd_driver_version(self):
-        if shutil.which("/usr/bin/dpkg") == None:
-            print("can not determine amdgpu version")
-            return(-1)
+    def check_amd_driver(self):
+        """ Check the drivers bound to the DRM cards.
+
+            return (0, driver) if the amdgpu driver is in use, or if there are no cards, else (-3, driver)
+        """
+        drivers = []
+        for driver_path in sorted(glob.glob(os.path.join(self.card_root, "card*", "device", "driver"))):
+            driver = os.path.basename(os.readlink(driver_path))
+            if self.DEBUG: print("%s: %s" % (driver_path, driver))
+            if driver not in drivers: drivers.append(driver)
+        if not drivers:
+            return(0, "")
+        if "amdgpu" in drivers and os.path.isdir(self.amdgpu_module):
+            return(0, "amdgpu")
+        return(-3, drivers[0])
+
+    def read_boot_id(self):
         try:
-            dpkg_out = subprocess.check_output(shlex.split('dpkg -l amdgpu'), shell=False,
-                    stderr=subprocess.DEVNULL).decode().split("\n")
-            for dpkg_line in dpkg_out:
-                searchObj = re.search('amdgpu', dpkg_line)
-                if(searchObj != None):
-                    dpkg_items = dpkg_line.split()
-                    print(f"amdgpu version: {dpkg_items[2]}")
-        except subprocess.CalledProcessError as e:
-            if re.search('exit status 1', str(e)) != None:
-                print(str(e))
-                print("Warning: amdgpu drivers not may not be installed.")
-                return(-1)
-                #print("Error: amdgpu drivers not installed, exiting...")
-                #sys.exit(-1)
-        except:
-            print("Warning: Cannot read determine amdgpu version.")
+            with open(self.boot_id_file) as boot_id_file:
+                return(boot_id_file.readline().strip())
+        except OSError:
+            return("")
+
+    def read_env_cache(self):
+        """ Return the environment cache for the current boot, or a new cache if there isn't one."""
+        boot_id = self.read_boot_id()
+        env_cache = {}
+        if boot_id:
+            try:
+                with open(self.env_cache_file) as env_cache_file:
+                    env_cache = json.load(env_cache_file)
+            except (OSError, ValueError):
+                pass
+        if env_cache.get("boot_id") != boot_id or env_cache.get("card_root") != self.card_root:
+            env_cache = {"boot_id": boot_id, "card_root": self.card_root}
+        return(env_cache)
+
+    def write_env_cache(self, env_cache):
+        """ Atomically write the environment cache, if the boot can be identified."""
+        if not env_cache.get("boot_id"): return
+        try:
+            write_atomic(self.env_cache_file, json.dumps(env_cache))
+        except OSError as err:
+            if self.DEBUG: print("Warning: can not write environment cache [%s]: %s" % (self.env_cache_file, err))
+
+    def read_amd_driver_version(self):
+        """ Return the version of the loaded amdgpu module, which is only available for packaged drivers,
+            or the kernel release for the in-kernel driver.  Return None if amdgpu is not loaded.
+        """
+        if not os.path.isdir(self.amdgpu_module):
+            return(None)
+        try:
+            with open(os.path.join(self.amdgpu_module, "version")) as version_file:
+                return(version_file.readline().strip())
+        except OSError:
+            return("kernel " + platform.release())
+
+    def get_amd_driver_version(self):
+        env_cache = self.read_env_cache()
+        if "amd_driver_version" not in env_cache:
+            env_cache["amd_driver_version"] = self.read_amd_driver_version()
+            self.write_env_cache(env_cache)
+        if env_cache["amd_driver_version"] == None:
+            print("Warning: amdgpu drivers not may not be installed.")
             return(-1)
+        print(f"amdgpu version: {env_cache['amd_driver_version']}")
         return(0)
 
 gut_const = GUT_CONST()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Time check_env and get_amd_driver_version on the fake sysfs tree, without the environment cache
+   (cold) and with the cache of the current boot (warm).  The lshw and dpkg commands which were
+   used before are timed too, if installed.
+"""
+import argparse
+import contextlib
+import io
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+from bench_common import use_fake_sysfs, time_call
+from GPUmodules import env
+
+
+def remove_env_cache():
+    try:
+        os.remove(env.gut_const.env_cache_file)
+    except FileNotFoundError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", help="number of calls timed", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        use_fake_sysfs(tmp_dir)
+        if not env.gut_const.read_boot_id():
+            print("Warning: no boot_id, so the environment cache is not used")
+        with contextlib.redirect_stdout(io.StringIO()):
+            check_cold = time_call(lambda: (remove_env_cache(), env.gut_const.check_env()), args.repeat)
+            check_warm = time_call(env.gut_const.check_env, args.repeat)
+            version_cold = time_call(lambda: (remove_env_cache(), env.gut_const.get_amd_driver_version()),
+                                     args.repeat)
+            version_warm = time_call(env.gut_const.get_amd_driver_version, args.repeat)
+        print("check_env:              cold %7.3f ms, warm %7.3f ms" % (check_cold, check_warm))
+        print("get_amd_driver_version: cold %7.3f ms, warm %7.3f ms" % (version_cold, version_warm))
+
+    for command in ("lshw -c video", "dpkg -l amdgpu"):
+        if shutil.which(command.split()[0]) is None:
+            print("%-23s not installed" % (command + ":"))
+            continue
+        run_time = time_call(lambda: subprocess.run(shlex.split(command), stdout=subprocess.DEVNULL,
+                                                    stderr=subprocess.DEVNULL), 3)
+        print("%-23s %7.3f ms" % (command + ":", run_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Shared setup of the benchmarks, which run against the fake sysfs tree of the tests."""
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "tests"))
+
+from fake_sysfs import FAKE_CARDS, make_fake_sysfs
+from GPUmodules import env
+
+
+def use_fake_sysfs(tmp_dir, cards=FAKE_CARDS):
+    """Create a fake sysfs tree under tmp_dir and point env at it, with a cache directory under tmp_dir."""
+    root = make_fake_sysfs(os.path.join(tmp_dir, "sys"), cards)
+    env.gut_const.card_root = os.path.join(root, "class", "drm") + "/"
+    env.gut_const.pci_root = os.path.join(root, "bus", "pci", "devices") + "/"
+    env.gut_const.amdgpu_module = os.path.join(root, "module", "amdgpu") + "/"
+    env.gut_const.cache_dir = os.path.join(tmp_dir, "cache")
+    env.gut_const.env_cache_file = os.path.join(env.gut_const.cache_dir, "env_check.json")
+    env.gut_const.inventory_file = os.path.join(env.gut_const.cache_dir, "inventory.json")
+    env.gut_const.clinfo_cache_file = os.path.join(env.gut_const.cache_dir, "clinfo.json")
+    return(root)
+
+
+def time_call(func, repeat):
+    """Return the mean time of func() in ms, over repeat calls."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return((time.perf_counter() - start) * 1000 / repeat)
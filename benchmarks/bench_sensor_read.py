@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Time the sysfs reads of one sample frame, with the persistent sensor files of GPUmodule
+   and with an open/read/close of each file as before.
+"""
+import argparse
+import tempfile
+from bench_common import use_fake_sysfs, time_call
+from GPUmodules import GPUmodule as GPU
+from GPUmodules import env
+
+
+def read_files_reopen(file_paths):
+    for file_path in file_paths:
+        with open(file_path) as sysfs_file:
+            sysfs_file.read()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", help="number of frames read", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        use_fake_sysfs(tmp_dir)
+        gpu_list = GPU.GPU_LIST()
+        gpu_list.get_gpu_list()
+        gpu_list.read_allgpu_pci_info()
+        gpu_list.read_gpu_driver_info()
+        gpu_list.read_gpu_sensor_static_data()
+        gpu_list = gpu_list.list_compatible_gpus()
+        gpu_list.read_gpu_sample_data()
+        file_paths = [f.file_path for v in gpu_list.list.values() for f in v.sysfs_files.values()]
+        print("%d GPUs, %d sensor files per frame" % (gpu_list.num_gpus(), len(file_paths)))
+
+        print("open/read/close:     %7.3f ms/frame" % time_call(lambda: read_files_reopen(file_paths), args.frames))
+        for workers in (1, 0):
+            env.gut_const.workers = workers
+            frame_ms = time_call(gpu_list.read_gpu_sample_data, args.frames)
+            print("read_gpu_sample_data %7.3f ms/frame, workers=%d" % (frame_ms, workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Time a frame of amdgpu-plot updateData, with the GPUPlotWindow figures drawn on Agg canvases.
+
+   GTK widgets are replaced by stubs, so this runs without a display.  Frames are timed when
+   only the animated artists are blitted, and when every frame forces a full draw of the figures.
+"""
+import argparse
+import os
+import runpy
+import sys
+from bench_common import REPO_DIR, time_call
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+class GtkStub:
+    """Accepts any GTK call, so GPUPlotWindow can build its figures without GTK."""
+    def __init__(self, *args, **kwargs): pass
+    def __getattr__(self, name): return(GtkStub())
+    def __call__(self, *args, **kwargs): return(GtkStub())
+    def get_children(self): return([])
+
+
+class AggCanvas(FigureCanvasAgg):
+    def set_size_request(self, width, height):
+        self.figure.set_size_inches(width/self.figure.dpi, height/self.figure.dpi)
+
+
+def load_plot_data(plot, num_cards, num_samples):
+    plot_data = plot["PlotData"]()
+    rng = np.random.default_rng(0)
+    time_values = mdates.date2num(np.datetime64("2026-01-01") + np.arange(num_samples) * np.timedelta64(2, "s"))
+    for card_num in range(num_cards):
+        walk = np.cumsum(rng.standard_normal(num_samples))
+        plot_data.extend(card_num, time_values, "2026-01-01 00:00:00", {
+            "model_display": np.array(["Radeon RX Vega"] * num_samples, dtype=object),
+            "loading": np.clip(50 + walk, 0, 100), "power": np.clip(100 + walk, 0, 220),
+            "power_cap": np.full(num_samples, 140.0), "energy": np.linspace(0, 1, num_samples),
+            "temp": 50 + walk/10, "vddgfx": 1000 + 4*walk, "sclk_f": 1400 + 4*walk,
+            "sclk_ps": np.full(num_samples, 7.0), "mclk_f": np.full(num_samples, 945.0),
+            "mclk_ps": np.full(num_samples, 3.0)})
+    plot_data.set_gpus()
+    return(plot_data)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", help="number of GPUs plotted, up to 8", type=int, default=4)
+    parser.add_argument("--history", help="number of samples plotted per GPU", type=int, default=300)
+    parser.add_argument("--frames", help="number of frames updated", type=int, default=50)
+    args = parser.parse_args()
+
+    sys.argv = ["amdgpu-plot"]
+    plot = runpy.run_path(os.path.join(REPO_DIR, "amdgpu-plot"), run_name="bench")
+    plot["updateData"].__globals__.update(np=np, pd=pd, mdates=mdates, plt=plt, FigureCanvas=AggCanvas,
+                                          Gtk=GtkStub(), Gdk=GtkStub())
+    plot_data = load_plot_data(plot, args.cards, args.history)
+    plot_data.capacity = args.history
+    gc = plot["GuiComponents"](plot_data)
+    plot["GPUPlotWindow"](gc, plot_data)
+    update_data = plot["updateData"]
+    update_data(gc, plot_data)
+
+    def update_full_draw():
+        for v in gc.gui_components["card_plots"].values():
+            v["ylim"] = None
+        for name in ("sclk_pstate_status", "mclk_pstate_status", "temp_status"):
+            gc.gui_components[name]["blit"].background = None
+        update_data(gc, plot_data)
+
+    print("%d GPUs, %d samples per GPU" % (args.cards, args.history))
+    print("updateData, blit:      %7.2f ms/frame" % time_call(lambda: update_data(gc, plot_data), args.frames))
+    print("updateData, full draw: %7.2f ms/frame" % time_call(update_full_draw, args.frames))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import os
+import sys
+import runpy
+import pytest
+
+# Tests import GPUmodules from the repository root, as the utilities do
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+def load_utility(name):
+    """Return the globals of a utility script, run without calling its main()."""
+    saved_argv = sys.argv
+    sys.argv = [name]
+    try:
+        return(runpy.run_path(os.path.join(REPO_DIR, name), run_name="utility_test"))
+    finally:
+        sys.argv = saved_argv
+
+
+@pytest.fixture(scope="session")
+def plot_module():
+    """Globals of amdgpu-plot with the modules it imports for plotting, except GTK."""
+    np = pytest.importorskip("numpy")
+    pd = pytest.importorskip("pandas")
+    mdates = pytest.importorskip("matplotlib.dates")
+    utility = load_utility("amdgpu-plot")
+    utility["add_log_rows"].__globals__.update(np=np, pd=pd, mdates=mdates)
+    return(utility)
+
+
+@pytest.fixture
+def fake_sysfs(tmp_path, monkeypatch):
+    """A fake sysfs tree of FAKE_CARDS, with env set to use it and a cache directory under tmp_path."""
+    from fake_sysfs import make_fake_sysfs
+    from GPUmodules import env
+    root = make_fake_sysfs(str(tmp_path / "sys"))
+    monkeypatch.setattr(env.gut_const, "card_root", os.path.join(root, "class", "drm") + "/")
+    monkeypatch.setattr(env.gut_const, "pci_root", os.path.join(root, "bus", "pci", "devices") + "/")
+    monkeypatch.setattr(env.gut_const, "amdgpu_module", os.path.join(root, "module", "amdgpu") + "/")
+    cache_dir = str(tmp_path / "cache")
+    monkeypatch.setattr(env.gut_const, "cache_dir", cache_dir)
+    monkeypatch.setattr(env.gut_const, "inventory_file", os.path.join(cache_dir, "inventory.json"))
+    monkeypatch.setattr(env.gut_const, "clinfo_cache_file", os.path.join(cache_dir, "clinfo.json"))
+    return(root)
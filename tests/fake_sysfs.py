@@ -0,0 +1,73 @@
+"""Build a fake sysfs tree of AMD GPUs, for tests run without GPUs."""
+import os
+
+# Card number, hwmon number and PCIe slot of each GPU, with sparse card and hwmon numbers as on
+# systems with integrated graphics, removed cards or other hwmon devices
+FAKE_CARDS = ((0, 2, "0000:03:00.0"), (1, 3, "0000:06:00.0"), (3, 5, "0000:09:00.0"), (4, 9, "0000:0c:00.0"),
+              (6, 10, "0000:0f:00.0"), (7, 14, "0000:23:00.0"), (9, 15, "0000:26:00.0"), (10, 21, "0000:29:00.0"),
+              (12, 22, "0000:43:00.0"), (15, 30, "0000:46:00.0"), (16, 31, "0000:83:00.0"), (21, 40, "0000:86:00.0"))
+
+PCI_DEVICE = {"class": "0x030000", "vendor": "0x1002", "device": "0x687f", "subsystem_vendor": "0x1002",
+              "subsystem_device": "0x0b36", "revision": "0xc1"}
+CARD_FILES = {
+    "pp_od_clk_voltage": "OD_SCLK:\n0:        852Mhz        800mV\n1:        991Mhz        900mV\nOD_MCLK:\n"
+                         "0:        167Mhz        800mV\nOD_RANGE:\nSCLK:     852MHz       2400MHz\n"
+                         "MCLK:     167MHz       1500MHz\nVDDC:     800mV        1200mV\n",
+    "vbios_version": "113-D0500100-105",
+    "power_dpm_state": "performance",
+    "current_link_speed": "8 GT/s",
+    "current_link_width": "16",
+    "pp_dpm_sclk": "0: 852Mhz \n1: 991Mhz *\n",
+    "pp_dpm_mclk": "0: 167Mhz \n1: 945Mhz *\n",
+    "pp_power_profile_mode": "NUM        MODE_NAME     SCLK_UP_HYST\n  0 BOOTUP_DEFAULT:        -\n"
+                             "  1 3D_FULL_SCREEN *:      0\n  4        COMPUTE :      5\n",
+    "power_dpm_force_performance_level": "manual",
+}
+HWMON_FILES = {"power1_cap_max": "220000000", "power1_cap_min": "0", "power1_cap": "140000000",
+               "power1_average": "118000000", "temp1_input": "35000", "temp1_crit": "91000", "fan1_max": "4900",
+               "fan1_min": "400", "pwm1_max": "255", "pwm1_min": "0", "fan1_enable": "1", "fan1_target": "0",
+               "fan1_input": "1200", "pwm1_enable": "1", "pwm1": "128", "in0_label": "vddgfx", "in0_input": "1037"}
+
+
+def write_file(file_path, value):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as sysfs_file:
+        sysfs_file.write(value if value.endswith("\n") else value + "\n")
+
+
+def make_fake_sysfs(root, cards=FAKE_CARDS):
+    """Create a fake sysfs tree under root, with class/drm, bus/pci and module/amdgpu trees."""
+    drm_root = os.path.join(root, "class", "drm")
+    pci_root = os.path.join(root, "bus", "pci", "devices")
+    driver_path = os.path.join(root, "bus", "pci", "drivers", "amdgpu")
+    os.makedirs(drm_root)
+    os.makedirs(pci_root)
+    os.makedirs(driver_path)
+    write_file(os.path.join(root, "module", "amdgpu", "parameters", "ppfeaturemask"), "4294934527")
+    for i, (card_num, hwmon_num, pci_slot) in enumerate(cards):
+        device_path = os.path.join(pci_root, pci_slot)
+        for name, value in PCI_DEVICE.items():
+            write_file(os.path.join(device_path, name), value)
+        for name, value in CARD_FILES.items():
+            write_file(os.path.join(device_path, name), value)
+        write_file(os.path.join(device_path, "gpu_busy_percent"), str(5*i))
+        os.symlink(driver_path, os.path.join(device_path, "driver"))
+        hwmon_path = os.path.join(device_path, "hwmon", "hwmon%d" % hwmon_num)
+        for name, value in HWMON_FILES.items():
+            write_file(os.path.join(hwmon_path, name), value)
+        card_path = os.path.join(drm_root, "card%d" % card_num)
+        os.makedirs(card_path)
+        os.symlink(device_path, os.path.join(card_path, "device"))
+        # Connectors of the card, which must not be taken as cards
+        connector_path = os.path.join(drm_root, "card%d-DP-1" % card_num)
+        os.makedirs(connector_path)
+        os.symlink(device_path, os.path.join(connector_path, "device"))
+    # Render nodes and devices which aren't AMD GPUs
+    os.makedirs(os.path.join(drm_root, "renderD128"))
+    write_file(os.path.join(pci_root, "0000:00:01.0", "class"), "0x060400")
+    write_file(os.path.join(pci_root, "0000:00:01.0", "vendor"), "0x1022")
+    write_file(os.path.join(pci_root, "0000:03:00.1", "class"), "0x040300")
+    write_file(os.path.join(pci_root, "0000:03:00.1", "vendor"), "0x1002")
+    write_file(os.path.join(pci_root, "0000:65:00.0", "class"), "0x030000")
+    write_file(os.path.join(pci_root, "0000:65:00.0", "vendor"), "0x10de")
+    return(root)
@@ -0,0 +1,19 @@
+"""Tests of the cache file helpers of env."""
+import os
+import pytest
+from GPUmodules import env
+
+
+def test_write_atomic(tmp_path):
+    file_path = str(tmp_path / "cache" / "amdgpu-utils" / "test.json")
+    env.write_atomic(file_path, '{"a": 1}')
+    env.write_atomic(file_path, '{"a": 2}')
+    with open(file_path) as cache_file:
+        assert cache_file.read() == '{"a": 2}'
+    assert os.listdir(os.path.dirname(file_path)) == ["test.json"]
+
+    # A directory can't be replaced by a file, and the temporary file is removed
+    os.makedirs(file_path + ".dir")
+    with pytest.raises(OSError):
+        env.write_atomic(file_path + ".dir", "{}")
+    assert sorted(os.listdir(os.path.dirname(file_path))) == ["test.json", "test.json.dir"]
@@ -0,0 +1,56 @@
+"""Tests of the OpenMetrics text rendered by amdgpu-exporter from a fixed sample."""
+from datetime import datetime
+from conftest import load_utility
+from GPUmodules import GPUmodule as GPU
+
+exporter = load_utility("amdgpu-exporter")
+
+
+def make_gpu_list():
+    gpu_list = GPU.GPU_LIST()
+    for card_num, pcie_id, model in (("0", "03:00.0", "RX Vega64"), ("3", "09:00.0", "Vega \"56\" \\ LC\nX")):
+        v = GPU.GPU_ITEM("uuid%s" % card_num)
+        v.set_params_value("card_num", card_num)
+        v.set_params_value("pcie_id", pcie_id)
+        v.set_params_value("model_display", model)
+        v.set_params_value("vbios", "113-D0500100-105")
+        v.set_params_value("driver", "amdgpu")
+        v.set_params_value("ppm", "1-3D_FULL_SCREEN")
+        v.set_params_value("loading", 42)
+        v.set_params_value("power", 118.5)
+        v.set_params_value("energy", 0.25)
+        v.set_params_value("temp", 35.0)
+        gpu_list.add_gpu(v)
+    # Sensors which weren't read are NaN
+    gpu_list.list["uuid3"].set_params_value("power", float("nan"))
+    gpu_list.frame_time = datetime(2026, 1, 1)
+    return(gpu_list)
+
+
+def test_metrics_snapshot():
+    snapshot = exporter["METRICS_SNAPSHOT"](make_gpu_list())
+    assert snapshot.data == b"# EOF\n"
+    snapshot.update()
+    lines = snapshot.data.decode("utf-8").split("\n")
+    assert lines[-2:] == ["# EOF", ""]
+    assert 'amdgpu_gpu_busy_percent{card="0",pcie_id="03:00.0"} 42.0' in lines
+    assert 'amdgpu_gpu_busy_percent{card="3",pcie_id="09:00.0"} 42.0' in lines
+    # NaN values are skipped
+    assert 'amdgpu_power_watts{card="0",pcie_id="03:00.0"} 118.5' in lines
+    assert not any(line.startswith('amdgpu_power_watts{card="3"') for line in lines)
+    assert not any(line.startswith("amdgpu_sclk_megahertz{") for line in lines)
+    assert not any("nan" in line.lower() for line in lines if not line.startswith("#"))
+    # Counters are sampled with the _total suffix, in J
+    assert "# TYPE amdgpu_energy_joules counter" in lines
+    assert 'amdgpu_energy_joules_total{card="0",pcie_id="03:00.0"} 900000.0' in lines
+    assert not any(line.startswith("amdgpu_energy_joules{") for line in lines)
+    # Label values are escaped
+    assert ('amdgpu_info{card="3",pcie_id="09:00.0",model="Vega \\"56\\" \\\\ LC\\nX",'
+            'vbios="113-D0500100-105",driver="amdgpu"} 1') in lines
+    assert 'amdgpu_power_profile_info{card="0",pcie_id="03:00.0",mode="1-3D_FULL_SCREEN"} 1' in lines
+    assert "amdgpu_sample_timestamp_seconds 1767225600.0" in lines
+
+
+def test_escape_label():
+    assert exporter["escape_label"]('a\\b"c\nd') == 'a\\\\b\\"c\\nd'
+    assert exporter["format_labels"]({"card": 1, "model": 'x"y'}) == '{card="1",model="x\\"y"}'
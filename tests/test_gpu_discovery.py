@@ -0,0 +1,68 @@
+"""Tests of GPU discovery and lookups on a fake sysfs tree with sparse card and hwmon numbers."""
+import os
+from fake_sysfs import FAKE_CARDS
+from GPUmodules import GPUmodule as GPU
+
+
+def test_card_and_hwmon_patterns():
+    assert GPU.CARD_RE.match("card12/device/pp_od_clk_voltage").group(1) == "12"
+    assert GPU.CARD_RE.match("card1-DP-1/device/pp_od_clk_voltage") is None
+    assert GPU.CARD_RE.match("renderD128/device/pp_od_clk_voltage") is None
+    assert GPU.HWMON_RE.search("/sys/class/drm/card3/device/hwmon/hwmon21")
+    assert GPU.HWMON_RE.search("/sys/class/drm/card3/device/hwmon/hwmon21/power1_cap") is None
+
+
+def test_discovery_of_sparse_cards(fake_sysfs):
+    assert len(FAKE_CARDS) > 10
+    gpu_list = GPU.GPU_LIST()
+    gpu_list.get_gpu_list()
+    assert gpu_list.num_gpus() == len(FAKE_CARDS)
+    gpu_items = list(gpu_list.list.values())
+    # Cards are listed in card number order, not glob order
+    assert [v.card_num for v in gpu_items] == [str(card_num) for card_num, _, _ in FAKE_CARDS]
+    for v, (card_num, hwmon_num, pci_slot) in zip(gpu_items, FAKE_CARDS):
+        assert v.card_path == os.path.join(fake_sysfs, "class", "drm", "card%d" % card_num, "device") + "/"
+        assert v.hwmon_path == v.card_path + "hwmon/hwmon%d/" % hwmon_num
+
+
+def test_find_gpu_by_card_num_and_pcie_id(fake_sysfs):
+    gpu_list = GPU.GPU_LIST()
+    gpu_list.get_gpu_list()
+    gpu_list.read_allgpu_pci_info()
+    for card_num, _, pci_slot in FAKE_CARDS:
+        uuid = gpu_list.find_gpu_by_card_num(card_num)
+        assert gpu_list.list[uuid].card_num == str(card_num)
+        assert gpu_list.find_gpu_by_card_num(str(card_num)) == uuid
+        assert gpu_list.find_gpu_by_pcie_id(pci_slot[len("0000:"):]) == uuid
+    # Numbers skipped in the sparse numbering, and slots of devices which aren't GPUs
+    assert gpu_list.find_gpu_by_card_num(2) == -1
+    assert gpu_list.find_gpu_by_card_num(22) == -1
+    assert gpu_list.find_gpu_by_pcie_id("03:00.1") == -1
+    assert gpu_list.find_gpu_by_pcie_id("65:00.0") == -1
+
+
+def test_lookups_follow_list_changes(fake_sysfs):
+    gpu_list = GPU.GPU_LIST()
+    gpu_list.get_gpu_list()
+    gpu_list.read_allgpu_pci_info()
+    assert gpu_list.find_gpu_by_pcie_id("46:00.0") != -1
+    compatible_list = gpu_list.list_compatible_gpus()
+    for card_num, _, pci_slot in FAKE_CARDS:
+        uuid = compatible_list.find_gpu_by_card_num(card_num)
+        assert uuid == gpu_list.find_gpu_by_card_num(card_num)
+        assert compatible_list.find_gpu_by_pcie_id(pci_slot[len("0000:"):]) == uuid
+
+
+def test_sample_read_of_sparse_cards(fake_sysfs):
+    gpu_list = GPU.GPU_LIST()
+    gpu_list.get_gpu_list()
+    gpu_list.read_allgpu_pci_info()
+    gpu_list.read_gpu_driver_info()
+    gpu_list.read_gpu_sensor_static_data()
+    compatible_list = gpu_list.list_compatible_gpus()
+    compatible_list.read_gpu_sample_data()
+    assert compatible_list.num_gpus() == len(FAKE_CARDS)
+    for i, (card_num, _, _) in enumerate(FAKE_CARDS):
+        v = compatible_list.list[compatible_list.find_gpu_by_card_num(card_num)]
+        assert v.get_params_value("loading") == 5*i
+        assert v.get_params_value("power") == 118.0
@@ -0,0 +1,29 @@
+"""Tests of the inventory cache of static GPU details."""
+from GPUmodules import GPUmodule as GPU
+from GPUmodules import env
+
+
+def make_gpu_list(num_gpus):
+    gpu_list = GPU.GPU_LIST()
+    for card_num in range(num_gpus):
+        gpu_item = GPU.GPU_ITEM("gpu%d" % card_num)
+        gpu_item.card_num = card_num
+        gpu_item.card_path = "/sys/class/drm/card%d/device/" % card_num
+        gpu_list.add_gpu(gpu_item)
+    return(gpu_list)
+
+
+def test_cache_does_not_restore_compatibility(tmp_path, monkeypatch):
+    monkeypatch.setattr(env.gut_const, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(env.gut_const, "inventory_file", str(tmp_path / "inventory.json"))
+    monkeypatch.setattr(env.gut_const, "read_boot_id", lambda: "boot-1")
+    gpu_list = make_gpu_list(2)
+    gpu_list.load_inventory("read_gpu_driver_info")
+    gpu_list.save_inventory("read_gpu_driver_info")
+
+    # Card 0 failed a check in this run, after being cached as compatible
+    gpu_list = make_gpu_list(2)
+    gpu_items = list(gpu_list.list.values())
+    gpu_items[0].compatible = False
+    assert gpu_list.load_inventory("read_gpu_driver_info")
+    assert [v.compatible for v in gpu_items] == [False, True]
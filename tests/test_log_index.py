@@ -0,0 +1,49 @@
+"""Tests of the sparse time index of text logs kept in the index file."""
+import json
+from GPUmodules import LOGmodule
+
+HEADER = "Time|card_num|power\n"
+
+def write_log(file_path, first_second, num_lines, mode="w"):
+    with open(file_path, mode) as log_file:
+        if mode == "w": log_file.write(HEADER)
+        for second in range(first_second, first_second + num_lines):
+            log_file.write("Sun Oct 18 %02d:%02d:%02d 2026|0|%d\n" % (second // 3600, second // 60 % 60, second % 60,
+                                                                    second % 300))
+
+
+def test_index_is_reused(tmp_path):
+    file_path = str(tmp_path / "log_monitor.txt")
+    index_file = str(tmp_path / "log_index.json")
+    write_log(file_path, 0, 2000)
+    reader = LOGmodule.TEXT_LOG_READER(file_path, index_step=4096, index_file=index_file)
+    assert len(reader.index_offsets) > 1
+    with open(index_file) as index:
+        assert json.load(index)[reader.index_key]["size"] == reader.end_position()
+
+    # Appending keeps the saved index, which is extended
+    write_log(file_path, 2000, 1000, mode="a")
+    reopened = LOGmodule.TEXT_LOG_READER(file_path, index_step=4096, index_file=index_file)
+    assert reopened.index_offsets[:len(reader.index_offsets)] == reader.index_offsets
+    assert len(reopened.index_offsets) > len(reader.index_offsets)
+
+
+def test_index_of_replaced_log_is_rebuilt(tmp_path):
+    file_path = str(tmp_path / "log_monitor.txt")
+    index_file = str(tmp_path / "log_index.json")
+    write_log(file_path, 0, 2000)
+    reader = LOGmodule.TEXT_LOG_READER(file_path, index_step=4096, index_file=index_file)
+    reader.log_file.close()
+
+    # Rewritten in place with other times, but the same time at the last index entry, and
+    # shorter, so the inode, index key and last entry are the same
+    with open(file_path, "rb") as log_file:
+        data = log_file.read()
+    last_offset = reader.index_offsets[-1]
+    data = data[:reader.index_offsets[1]].replace(b" 00:", b" 05:") + data[reader.index_offsets[1]:last_offset + 100]
+    with open(file_path, "wb") as log_file:
+        log_file.write(data[:data.rfind(b"\n") + 1])
+    reopened = LOGmodule.TEXT_LOG_READER(file_path, index_step=4096, index_file=index_file)
+    assert reopened.index_key == reader.index_key
+    assert reopened.index_times[0] == reopened.line_time(reopened.index_offsets[0])
+    assert reopened.index_times[0] != reader.index_times[0]
@@ -0,0 +1,86 @@
+"""Tests of seeking in a log with a plot window, which samples the window into the history tiers."""
+from datetime import datetime, timedelta
+import pytest
+from GPUmodules import LOGmodule
+
+NUM_FRAMES = 20000
+START_TIME = datetime(2026, 10, 18)
+
+def frame_values(second, card_num):
+    # A sawtooth, with a spike every 1000 s
+    return(1000.0 if second % 1000 == 500 else float(second % 300 + card_num))
+
+
+def write_text_log(file_path):
+    with open(file_path, "w") as log_file:
+        log_file.write("Time|Card#|model_display|power\n")
+        for second in range(NUM_FRAMES):
+            time_str = (START_TIME + timedelta(seconds=second)).strftime("%a %b %d %H:%M:%S %Y")
+            for card_num in (0, 1):
+                log_file.write("%s|%d|GPU|%r\n" % (time_str, card_num, frame_values(second, card_num)))
+    return(LOGmodule.TEXT_LOG_READER(file_path, index_step=4096))
+
+
+def write_column_log(file_path):
+    writer = LOGmodule.COLUMN_LOG_WRITER(file_path, ["power"], ["model_display"],
+                                         [{"card_num": 0}, {"card_num": 1}], 0, chunk_rows=1000, rotate_bytes=0,
+                                         rotate_seconds=0, compress="none")
+    epoch_ns = LOGmodule.datetime_to_epoch_ns(START_TIME)
+    for second in range(NUM_FRAMES):
+        writer.write_frame(epoch_ns + second * 10**9,
+                           [([frame_values(second, card_num)], ["GPU"]) for card_num in (0, 1)])
+    writer.close()
+    return(LOGmodule.COLUMN_LOG_READER(file_path))
+
+
+def test_column_reader_steps(tmp_path):
+    reader = write_column_log(str(tmp_path / "log_monitor.bin"))
+    times = reader.get_times()
+    power = reader.get_column(1, "power")
+    for start, stop, step in ((0, NUM_FRAMES, 1), (3, 9000, 8), (999, 5001, 64), (1500, 1600, 512)):
+        assert list(reader.get_times(start, stop, step)) == list(times[start:stop:step])
+        assert list(reader.get_column(1, "power", start, stop, step)) == list(power[start:stop:step])
+    assert list(reader.get_column(0, "model_display", 5, 3000, 1000)) == ["GPU"]*3
+
+
+def test_text_reader_sample_text(tmp_path):
+    reader = write_text_log(str(tmp_path / "log_monitor.txt"))
+    text = reader.get_sample_text(reader.start_position(), reader.end_position(), 100000)
+    lines = text.splitlines()
+    assert len(lines) == 2 * -(-(reader.end_position() - reader.start_position()) // 100000)
+    # Whole frames, of one line per card
+    for frame in zip(lines[::2], lines[1::2]):
+        assert [line.split("|")[1] for line in frame] == ["0", "1"]
+        assert frame[0].split("|")[0] == frame[1].split("|")[0]
+
+
+@pytest.mark.parametrize("write_log", [write_text_log, write_column_log])
+def test_seek_with_window(tmp_path, plot_module, monkeypatch, write_log):
+    reader = write_log(str(tmp_path / "log_monitor"))
+    num_read = []
+    add_log_rows = plot_module["add_log_rows"]
+    monkeypatch.setitem(add_log_rows.__globals__, "add_plot_lines",
+                        lambda plot_data, ldf, *args: num_read.append(len(ldf)) or
+                            plot_module["add_plot_lines"](plot_data, ldf, *args))
+    plot_data = plot_module["PlotData"]()
+    plot_data.capacity = 100
+    plot_data.window = (NUM_FRAMES - 1000) / 86400
+    replay = plot_module["LogReplay"](plot_data, reader, 1.0)
+    replay.seek(None)
+    if write_log is write_text_log:
+        assert sum(num_read) < NUM_FRAMES // 5
+
+    # The plot view covers the window, as when all records of the window are read
+    full_data = plot_module["PlotData"]()
+    full_data.capacity = plot_data.capacity
+    full_data.window = plot_data.window
+    window_start = reader.find_position(replay.clock_ns - int(plot_data.window * 86400e9))
+    add_log_rows(full_data, reader, window_start, reader.end_position())
+    for card_num in (0, 1):
+        times, values = plot_data.get_plot_view(card_num, ["power"], 1000)
+        full_times, full_values = full_data.get_plot_view(card_num, ["power"], 1000)
+        assert abs(len(times) - len(full_times)) <= len(full_times) // 10
+        assert times[0] == pytest.approx(full_times[0], abs=64/86400)
+        assert times[-1] == pytest.approx(full_times[-1], abs=64/86400)
+        assert values["power"].max() <= 1000.0
+        assert plot_data.get_last_value(card_num, "power") == frame_values(NUM_FRAMES - 1, card_num)
@@ -0,0 +1,115 @@
+"""Tests of readers following a log across rotation by LOG_WRITER."""
+import os
+from GPUmodules import LOGmodule
+
+HEADER = "Time|card_num|power\n"
+
+def log_line(second, card_num=0, power=100):
+    return("Sun Oct 18 10:%02d:%02d 2026|%d|%d\n" % (second // 60, second % 60, card_num, power))
+
+
+def test_text_reader_follows_rotation(tmp_path):
+    file_path = str(tmp_path / "log_monitor.txt")
+    writer = LOGmodule.LOG_WRITER(file_path, HEADER, flush_seconds=3600, flush_bytes=1, rotate_bytes=200,
+                                  rotate_seconds=0)
+    writer.write(log_line(0))
+    reader = LOGmodule.TEXT_LOG_READER(file_path)
+    assert reader.get_text(reader.start_position()) == log_line(0)
+
+    # Written before the rotation, read from the rotated segment through the open file
+    second = 1
+    while writer.segment == 0:
+        writer.write(log_line(second))
+        second += 1
+    assert reader.refresh() > 0
+    assert reader.rotations == 0
+    assert reader.get_text(reader.start_position()).splitlines()[-1] == log_line(second - 1).strip()
+
+    # The new log is opened once the rotated one was read to its end
+    assert reader.refresh() == 0
+    assert reader.rotations == 1
+    writer.write(log_line(second, power=200))
+    assert reader.refresh() > 0
+    assert reader.get_text(reader.start_position()) == log_line(second, power=200)
+    writer.close()
+    assert os.path.exists(str(tmp_path / "log_monitor.1.txt.gz"))
+
+
+def test_text_reader_follows_truncation(tmp_path):
+    file_path = str(tmp_path / "log_monitor.txt")
+    with open(file_path, "w") as log_file:
+        log_file.write(HEADER + log_line(0) + log_line(1))
+    reader = LOGmodule.TEXT_LOG_READER(file_path)
+    with open(file_path, "w") as log_file:
+        log_file.write(HEADER + log_line(5))
+    assert reader.refresh() > 0
+    assert reader.rotations == 1
+    assert reader.get_text(reader.start_position()) == log_line(5)
+
+
+def test_column_reader_follows_rotation(tmp_path):
+    file_path = str(tmp_path / "log_monitor.bin")
+    cards = [{"card_num": 0}]
+    writer = LOGmodule.COLUMN_LOG_WRITER(file_path, ["power"], ["ppm"], cards, 0, chunk_rows=1,
+                                         flush_seconds=3600, flush_bytes=1, rotate_bytes=1024, rotate_seconds=0,
+                                         compress="none")
+    writer.write_frame(1000, [([100.0], ["3D"])])
+    reader = LOGmodule.COLUMN_LOG_READER(file_path)
+    assert reader.end_position() == 1
+
+    epoch_ns = 2000
+    while writer.segment == 0:
+        writer.write_frame(epoch_ns, [([100.0], ["3D"])])
+        epoch_ns += 1000
+    reader.refresh()
+    assert reader.rotations == 0
+    assert reader.time_range()[1] == epoch_ns - 1000
+
+    writer.write_frame(epoch_ns, [([200.0], ["3D"])])
+    assert reader.refresh() == 1
+    assert reader.rotations == 1
+    assert reader.start_position() == 0
+    assert list(reader.get_column(0, "power")) == [200.0]
+    writer.close()
+
+
+def test_text_reader_waits_for_new_header(tmp_path):
+    file_path = str(tmp_path / "log_monitor.txt")
+    with open(file_path, "w") as log_file:
+        log_file.write(HEADER + log_line(0))
+    reader = LOGmodule.TEXT_LOG_READER(file_path)
+    os.replace(file_path, str(tmp_path / "log_monitor.1.txt"))
+    open(file_path, "w").close()
+    assert reader.refresh() == 0
+    assert reader.rotations == 0
+    with open(file_path, "w") as log_file:
+        log_file.write(HEADER + log_line(1))
+    assert reader.refresh() > 0
+    assert reader.rotations == 1
+    assert reader.get_text(reader.start_position()) == log_line(1)
+
+
+def test_replay_follows_rotation(tmp_path, plot_module):
+    file_path = str(tmp_path / "log_monitor.bin")
+    writer = LOGmodule.COLUMN_LOG_WRITER(file_path, ["power"], ["model_display"], [{"card_num": 0}], 0,
+                                         chunk_rows=1, flush_seconds=3600, flush_bytes=1, rotate_bytes=1024,
+                                         rotate_seconds=0, compress="none")
+    epoch_ns = 1700000000 * 10**9
+    writer.write_frame(epoch_ns, [([100.0], ["GPU"])])
+    plot_data = plot_module["PlotData"]()
+    replay = plot_module["LogReplay"](plot_data, LOGmodule.COLUMN_LOG_READER(file_path), 1.0)
+    replay.seek(None)
+    assert plot_data.get_last_value(0, "power") == 100.0
+
+    while writer.segment == 0:
+        epoch_ns += 10**9
+        writer.write_frame(epoch_ns, [([150.0], ["GPU"])])
+    replay.advance()
+    assert plot_data.get_last_value(0, "power") == 150.0
+    epoch_ns += 10**9
+    writer.write_frame(epoch_ns, [([200.0], ["GPU"])])
+    replay.advance()
+    replay.advance()
+    assert replay.log_reader.rotations == 1
+    assert plot_data.get_last_value(0, "power") == 200.0
+    writer.close()
@@ -0,0 +1,44 @@
+"""Test that the text mode of amdgpu-monitor doesn't import the GUI and plot modules."""
+import json
+import os
+import subprocess
+import sys
+from conftest import REPO_DIR
+
+# Run in a new interpreter, as other tests import the plot modules
+MONITOR_SCRIPT = """
+import json, os, runpy, sys, time
+repo_dir, tmp_dir = sys.argv[1:3]
+sys.path[:0] = [repo_dir, os.path.join(repo_dir, "tests")]
+from fake_sysfs import make_fake_sysfs
+from GPUmodules import env
+root = make_fake_sysfs(os.path.join(tmp_dir, "sys"))
+env.gut_const.card_root = os.path.join(root, "class", "drm") + "/"
+env.gut_const.pci_root = os.path.join(root, "bus", "pci", "devices") + "/"
+env.gut_const.amdgpu_module = os.path.join(root, "module", "amdgpu") + "/"
+env.gut_const.featuremask = os.path.join(root, "module", "amdgpu", "parameters", "ppfeaturemask")
+
+def stop_monitor(seconds):
+    raise KeyboardInterrupt
+time.sleep = stop_monitor
+sys.argv = ["amdgpu-monitor"]
+try:
+    runpy.run_path(os.path.join(repo_dir, "amdgpu-monitor"), run_name="__main__")
+except SystemExit as err:
+    exit_code = err.code
+print(json.dumps({"exit_code": exit_code,
+                  "modules": sorted(name for name in ("gi", "matplotlib", "pandas") if name in sys.modules)}))
+"""
+
+
+def test_text_monitor_imports(tmp_path):
+    env = dict(os.environ, XDG_CACHE_HOME=str(tmp_path / "cache"))
+    result = subprocess.run([sys.executable, "-c", MONITOR_SCRIPT,
+                             REPO_DIR, str(tmp_path)], cwd=str(tmp_path), env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    output = result.stdout.rstrip().split("\n")
+    status = json.loads(output[-1])
+    assert status["exit_code"] == 0, result.stdout
+    assert "12 are confirmed compatible." in output
+    assert status["modules"] == []
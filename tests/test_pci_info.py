@@ -0,0 +1,45 @@
+"""Tests of reading GPU PCI details from the fake /sys/bus/pci tree."""
+import os
+from fake_sysfs import FAKE_CARDS, write_file
+from GPUmodules import GPUmodule as GPU
+
+
+def read_pci_info():
+    gpu_list = GPU.GPU_LIST()
+    gpu_list.get_gpu_list()
+    gpu_list.read_allgpu_pci_info()
+    return(gpu_list)
+
+
+def test_pci_info_of_all_cards(fake_sysfs):
+    gpu_list = read_pci_info()
+    for card_num, _, pci_slot in FAKE_CARDS:
+        v = gpu_list.list[gpu_list.find_gpu_by_card_num(card_num)]
+        assert v.get_params_value("pcie_id") == pci_slot[len("0000:"):]
+        assert v.get_params_value("driver") == "amdgpu"
+        assert v.get_params_value("model") == "Vega 10 XL/XT [Radeon RX Vega 56/64] (rev c1)"
+        assert v.get_params_value("model_short") == " RX Vega 56/64"
+        assert v.compatible
+
+
+def test_pci_info_special_cases(fake_sysfs):
+    pci_root = os.path.join(fake_sysfs, "bus", "pci", "devices")
+    # A Fiji Pro Duo, which isn't compatible
+    fiji_slot = FAKE_CARDS[1][2]
+    write_file(os.path.join(pci_root, fiji_slot, "device"), "0x7300")
+    write_file(os.path.join(pci_root, fiji_slot, "subsystem_device"), "0x1b36")
+    # A card without a bound driver, a display controller, and a card of a device which isn't a GPU
+    os.remove(os.path.join(pci_root, FAKE_CARDS[2][2], "driver"))
+    write_file(os.path.join(pci_root, FAKE_CARDS[3][2], "class"), "0x038000")
+    write_file(os.path.join(pci_root, FAKE_CARDS[4][2], "class"), "0x040300")
+
+    gpu_list = read_pci_info()
+    get_gpu = lambda i: gpu_list.list[gpu_list.find_gpu_by_card_num(FAKE_CARDS[i][0])]
+    assert get_gpu(1).get_params_value("model") == "Radeon Fiji Pro Duo"
+    assert not get_gpu(1).compatible
+    assert get_gpu(2).get_params_value("driver") == "UNKNOWN"
+    assert not get_gpu(2).compatible
+    assert get_gpu(3).get_params_value("pcie_id") == FAKE_CARDS[3][2][len("0000:"):]
+    assert get_gpu(4).get_params_value("pcie_id") == ""
+    assert gpu_list.find_gpu_by_pcie_id(FAKE_CARDS[4][2][len("0000:"):]) == -1
+    assert sum(v.compatible for v in gpu_list.list.values()) == len(FAKE_CARDS) - 2
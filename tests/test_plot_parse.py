@@ -0,0 +1,20 @@
+"""Tests of parsing plot data lines in amdgpu-plot."""
+import math
+
+HEADER = ["Time", "Card#", "model_display", "loading", "power", "ppm"]
+TIME = "Sun Oct 18 10:00:00 2026"
+
+
+def test_parse_plot_lines(plot_module):
+    text = ("%s|0|RX Vega64|42|118.5|1-3D\n"
+            "%s|1|RX Vega64|-1|NA|1-3D\n"
+            "%s|2|RX Vega64|bad|1e400x|1-3D\n"
+            "%s|x|RX Vega64|1|1|1-3D\n"
+            "%s|3|RX Vega64|1|1|1-3D|too|many\n") % ((TIME,)*5)
+    ldf = plot_module["parse_plot_lines"](HEADER, text)
+    assert list(ldf["Card#"]) == [0.0, 1.0, 2.0]
+    assert ldf["loading"].dtype == float and ldf["power"].dtype == float
+    assert list(ldf["loading"])[0] == 42.0 and list(ldf["power"])[0] == 118.5
+    # Missing values and values which aren't numbers are NaN
+    assert all(math.isnan(value) for value in list(ldf["loading"])[1:] + list(ldf["power"])[1:])
+    assert list(ldf["model_display"]) == ["RX Vega64"]*3
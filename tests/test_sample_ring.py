@@ -0,0 +1,38 @@
+"""Tests of the sample ring file written by amdgpu-sampler."""
+import sys
+import math
+import pytest
+from array import array
+from GPUmodules import RINGmodule
+
+
+def test_ring_round_trip(tmp_path):
+    file_path = str(tmp_path / "ring")
+    writer = RINGmodule.SAMPLE_RING_WRITER(file_path, ("power", "temp"), ("state",), (0, 3), num_slots=4)
+    reader = RINGmodule.SAMPLE_RING_READER(file_path)
+    assert reader.read_latest() is None
+    for frame in range(1, 7):
+        writer.write_frame(frame*1000, [array("d", (1.5*frame, float("nan"))), array("d", (2.5, -frame))],
+                           [("S%d" % frame,), ("x"*40,)])
+    frame_num, epoch_ns, samples, strings = reader.read_latest()
+    assert (frame_num, epoch_ns) == (6, 6000)
+    assert list(samples[0])[0] == 9.0 and math.isnan(samples[0][1])
+    assert list(samples[1]) == [2.5, -6.0]
+    assert strings == [{"state": "S6"}, {"state": "x"*RINGmodule.RING_STR_LEN}]
+    assert reader.read_latest() is None
+    writer.close()
+
+
+def test_ring_byte_order(tmp_path):
+    file_path = str(tmp_path / "ring")
+    RINGmodule.SAMPLE_RING_WRITER(file_path, ("power",), (), (0,)).close()
+    foreign = "big" if sys.byteorder == "little" else "little"
+    with open(file_path, "r+b") as ring_file:
+        data = ring_file.read()
+        # Keep the length of the JSON description by padding it with white space
+        native = ('"byteorder": "%s"' % sys.byteorder).encode("utf-8")
+        data = data.replace(native, ('"byteorder": "%s"' % foreign).encode("utf-8").ljust(len(native)))
+        ring_file.seek(0)
+        ring_file.write(data)
+    with pytest.raises(ValueError):
+        RINGmodule.SAMPLE_RING_READER(file_path)